@@ -0,0 +1,108 @@
+"""Add job tracking columns to simulation_jobs table
+
+Revision ID: add_job_columns
+Revises: add_simulator_type
+Create Date: 2026-10-19
+
+This migration adds the columns introduced after multi-simulator support:
+- idempotency_key: client-supplied Idempotency-Key, with a unique index that
+  deduplicates concurrent submissions
+- log_path: storage path of the compressed simulator log
+- queue: worker class queue chosen by the pre-flight check, indexed
+- claimed_at: when the packer claimed the job for a batch
+- timings: per-phase timing record
+- profile: whether to capture a cProfile of the worker (NOT NULL, so existing
+  rows get the server default false)
+- tuned_parameters: Gadget4 auto-tuning record
+
+``init_db()`` only creates missing tables, so existing deployments must run
+this migration before starting the new API and workers.
+
+Usage:
+    # If using Alembic
+    alembic upgrade head
+
+    # Or run this script directly
+    python alembic_migration_add_job_columns.py
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = "add_job_columns"
+down_revision = "add_simulator_type"
+branch_labels = None
+depends_on = None
+
+TABLE = "simulation_jobs"
+
+
+def columns():
+    """Columns added by this migration."""
+    return [
+        sa.Column("idempotency_key", sa.String(), nullable=True),
+        sa.Column("log_path", sa.String(), nullable=True),
+        sa.Column("queue", sa.String(), nullable=True),
+        sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("timings", sa.JSON(), nullable=True),
+        sa.Column(
+            "profile", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+        sa.Column("tuned_parameters", sa.JSON(), nullable=True),
+    ]
+
+
+# (index name, column, unique)
+INDEXES = [
+    ("ix_simulation_jobs_idempotency_key", "idempotency_key", True),
+    ("ix_simulation_jobs_queue", "queue", False),
+]
+
+
+def upgrade():
+    """Add the job tracking columns and their indexes."""
+    for column in columns():
+        op.add_column(TABLE, column)
+    for name, column, unique in INDEXES:
+        op.create_index(name, TABLE, [column], unique=unique)
+
+
+def downgrade():
+    """Remove the job tracking columns and their indexes."""
+    for name, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=TABLE)
+    for column in reversed(columns()):
+        op.drop_column(TABLE, column.name)
+
+
+if __name__ == "__main__":
+    """Run migration directly without Alembic, skipping existing columns."""
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from sqlalchemy import inspect
+
+    from src.common.database import engine
+
+    print("Running migration: Add job tracking columns")
+
+    inspector = inspect(engine)
+    existing = {col["name"] for col in inspector.get_columns(TABLE)}
+    indexes = {index["name"] for index in inspector.get_indexes(TABLE)}
+
+    with engine.begin() as conn:
+        operations = Operations(MigrationContext.configure(conn))
+        for column in columns():
+            if column.name in existing:
+                print(f"✓ Column '{column.name}' already exists. Skipping.")
+                continue
+            operations.add_column(TABLE, column)
+            print(f"  - Added '{column.name}' column")
+        for name, column, unique in INDEXES:
+            if name in indexes:
+                print(f"✓ Index '{name}' already exists. Skipping.")
+                continue
+            operations.create_index(name, TABLE, [column], unique=unique)
+            print(f"  - Created index '{name}'")
+
+    print("✓ Migration completed successfully!")
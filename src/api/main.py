@@ -13,7 +13,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from common.config import settings  # noqa: E402
 from common.database import init_db  # noqa: E402
 from common.schemas import HealthResponse  # noqa: E402
-from api.routers import jobs  # noqa: E402
+from api.routers import jobs, queues  # noqa: E402
 
 
 @asynccontextmanager
@@ -49,6 +49,7 @@ app.add_middleware(
 
 # Include routers
 app.include_router(jobs.router, prefix="/api/v1", tags=["jobs"])
+app.include_router(queues.router, prefix="/api/v1", tags=["queues"])
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -1,29 +1,170 @@
 """API endpoints for simulation jobs."""
 
+import gzip
+import hashlib
+import json
+import logging
 import uuid
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import numpy as np
+import redis
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from common.config import settings
 from common.database import get_db
-from common.models import SimulationJob, JobStatus
+from common.logs import (
+    INDEX_SUFFIX,
+    live_tail_key,
+    log_object_key,
+    read_log_range,
+    read_log_tail,
+)
+from common.models import SimulationJob, SimulationStep, JobStatus
+from common.redis_client import get_redis
+from common.resources import preflight
+from common.spatial import (
+    CELLS_SUFFIX,
+    RegionTooLarge,
+    query_region,
+    read_cell_offsets,
+)
+from common.storage import get_storage
+from common.preview import PREVIEW_SUFFIX, TileCache
 from common.schemas import (
+    JobStatusQuery,
+    JobStatusTable,
+    JobSteps,
+    JobTimings,
+    PreflightReport,
+    RegionParticles,
+    RegionQuery,
+    StepStats,
     SimulationJobCreate,
     SimulationJobResponse,
     SimulationJobList,
 )
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+IDEMPOTENCY_KEY_PREFIX = "idempotency:"
+
+
+def _find_idempotent_job(
+    db: Session, cache: redis.Redis, key: str
+) -> Optional[SimulationJob]:
+    """Look up the job created for an Idempotency-Key, Redis first."""
+    try:
+        job_id = cache.get(IDEMPOTENCY_KEY_PREFIX + key)
+    except redis.RedisError:
+        logger.warning("Redis unavailable, checking Idempotency-Key in database")
+        job_id = None
+
+    if job_id:
+        job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
+        if job:
+            return job
+
+    return db.query(SimulationJob).filter(SimulationJob.idempotency_key == key).first()
+
+
+def _remember_idempotent_job(cache: redis.Redis, key: str, job_id: str) -> None:
+    """Cache the Idempotency-Key to job ID mapping."""
+    try:
+        cache.set(IDEMPOTENCY_KEY_PREFIX + key, job_id, ex=settings.idempotency_key_ttl)
+    except redis.RedisError:
+        logger.warning(f"Could not cache Idempotency-Key for job {job_id}")
+
+
+def _replay(
+    job: SimulationJob, request: SimulationJobCreate, response: Response
+) -> SimulationJob:
+    """Return the original job for a repeated request with the same key."""
+    if (
+        job.name != request.name
+        or job.description != request.description
+        or job.simulator_type != request.simulator_type
+        or job.num_particles != request.num_particles
+        or job.box_size != request.box_size
+        or job.parameters != request.parameters
+        or job.profile != request.profile
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    response.headers["Idempotent-Replayed"] = "true"
+    return job
+
+
+@router.post("/jobs/preflight", response_model=PreflightReport)
+def preflight_job(job: SimulationJobCreate, db: Session = Depends(get_db)):
+    """
+    Dry-run a job submission.
+
+    Builds the full parameter set, estimates per-rank memory for particles,
+    tree and PM grid, and reports which worker queue the job would be routed
+    to, or why it cannot run on any configured worker class. Gadget4 jobs
+    also report the auto-tuned parameters the worker would pick.
+    """
+    return preflight(
+        job.simulator_type, job.box_size, job.num_particles, job.parameters, db
+    )
+
+
 @router.post(
     "/jobs",
     response_model=SimulationJobResponse,
     status_code=status.HTTP_201_CREATED,
 )
-async def create_job(job: SimulationJobCreate, db: Session = Depends(get_db)):
-    """Create a new simulation job."""
+async def create_job(
+    job: SimulationJobCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
+    db: Session = Depends(get_db),
+    cache: redis.Redis = Depends(get_redis),
+):
+    """
+    Create a new simulation job.
+
+    Retries that send the same ``Idempotency-Key`` header get the original
+    job back instead of creating and queueing a duplicate. Redis caches the
+    key for fast lookups; the unique ``idempotency_key`` column keeps this
+    correct when concurrent retries race across API workers.
+    """
+    if idempotency_key:
+        existing = _find_idempotent_job(db, cache, idempotency_key)
+        if existing:
+            return _replay(existing, job, response)
+
+    # Reject jobs that cannot fit any worker class before they are queued
+    report = preflight(
+        job.simulator_type, job.box_size, job.num_particles, job.parameters
+    )
+    if not report.feasible:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=report.model_dump(),
+        )
+
     # Generate unique job ID
     job_id = str(uuid.uuid4())
 
@@ -32,25 +173,118 @@ async def create_job(job: SimulationJobCreate, db: Session = Depends(get_db)):
         id=job_id,
         name=job.name,
         description=job.description,
+        simulator_type=job.simulator_type,
         num_particles=job.num_particles,
         box_size=job.box_size,
         parameters=job.parameters,
         status=JobStatus.PENDING,
+        queue=report.queue,
+        idempotency_key=idempotency_key,
+        profile=job.profile,
     )
 
     db.add(db_job)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same key won the insert
+        db.rollback()
+        if not idempotency_key:
+            raise
+        existing = _find_idempotent_job(db, cache, idempotency_key)
+        if not existing:
+            raise
+        return _replay(existing, job, response)
     db.refresh(db_job)
 
+    if idempotency_key:
+        _remember_idempotent_job(cache, idempotency_key, job_id)
+
     # TODO: Submit job to Celery worker
+    # Jobs up to settings.pack_max_particles are dispatched in bin-packed
+    # batches by workers.tasks.pack_small_jobs and must not be sent here.
     # from workers.tasks import run_simulation
-    # task = run_simulation.delay(job_id)
+    # task = run_simulation.apply_async(args=[job_id], queue=db_job.queue)
     # db_job.celery_task_id = task.id
     # db.commit()
 
     return db_job
 
 
+STATUS_FIELDS = (
+    "id",
+    "status",
+    "progress",
+    "created_at",
+    "started_at",
+    "completed_at",
+)
+GZIP_MIN_BYTES = 1024  # Smaller bodies are sent uncompressed
+
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    """Return a timestamp as Unix seconds, treating naive ones as UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return round(value.timestamp(), 3)
+
+
+@router.post("/jobs/status", response_model=JobStatusTable)
+async def get_job_statuses(
+    query: JobStatusQuery,
+    accept_encoding: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the status of many jobs at once, for dashboards that poll sweeps.
+
+    Answers the IDs (``JobStatusQuery`` caps them at ``bulk_status_max_ids``,
+    counting duplicates) from one primary-key ``IN`` query that reads only
+    the status columns. Rows are arrays in the order
+    of ``fields``, and the body is gzipped when the client accepts it.
+    """
+    ids = list(dict.fromkeys(query.ids))
+
+    rows = (
+        db.query(
+            SimulationJob.id,
+            SimulationJob.status,
+            SimulationJob.progress,
+            SimulationJob.created_at,
+            SimulationJob.started_at,
+            SimulationJob.completed_at,
+        )
+        .filter(SimulationJob.id.in_(ids))
+        .all()
+    )
+    found = {row.id: row for row in rows}
+
+    table = {
+        "fields": list(STATUS_FIELDS),
+        "jobs": [
+            [
+                job_id,
+                found[job_id].status.value,
+                found[job_id].progress,
+                _epoch(found[job_id].created_at),
+                _epoch(found[job_id].started_at),
+                _epoch(found[job_id].completed_at),
+            ]
+            for job_id in ids
+            if job_id in found
+        ],
+        "missing": [job_id for job_id in ids if job_id not in found],
+    }
+    body = json.dumps(table, separators=(",", ":")).encode()
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in (accept_encoding or "") and len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/jobs", response_model=SimulationJobList)
 async def list_jobs(
     skip: int = 0,
@@ -95,6 +329,335 @@ async def get_job(job_id: str, db: Session = Depends(get_db)):
     return job
 
 
+@router.get("/jobs/{job_id}/timings", response_model=JobTimings)
+async def get_job_timings(job_id: str, db: Session = Depends(get_db)):
+    """
+    Get the per-phase timing record of a job.
+
+    Phases are recorded when the worker finishes with the job, whether it
+    succeeded or failed; until then the list is empty.
+    """
+    job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found",
+        )
+
+    timings = job.timings or {"phases": [], "total_seconds": 0.0}
+    return JobTimings(job_id=job.id, status=job.status, **timings)
+
+
+@router.get("/jobs/{job_id}/steps", response_model=JobSteps)
+async def get_job_steps(
+    job_id: str,
+    max_points: int = Query(500, ge=1, le=10000, description="Points returned"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get Gadget4's per-step performance records for a job, for plotting.
+
+    Runs with more than ``max_points`` steps are downsampled in the database
+    into buckets of consecutive steps: timings are averaged, while the
+    imbalance is the worst in the bucket so spikes stay visible.
+    """
+    job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found",
+        )
+
+    total_steps, first_step = (
+        db.query(func.count(SimulationStep.step), func.min(SimulationStep.step))
+        .filter(SimulationStep.job_id == job_id)
+        .one()
+    )
+    width = max(-(-total_steps // max_points), 1)
+    bucket = (SimulationStep.step - (first_step or 0)) // width
+    rows = (
+        db.query(
+            func.min(SimulationStep.step).label("step"),
+            func.max(SimulationStep.time).label("time"),
+            func.avg(SimulationStep.total_seconds).label("total_seconds"),
+            func.avg(SimulationStep.tree_seconds).label("tree_seconds"),
+            func.avg(SimulationStep.pm_seconds).label("pm_seconds"),
+            func.avg(SimulationStep.domain_seconds).label("domain_seconds"),
+            func.avg(SimulationStep.io_seconds).label("io_seconds"),
+            func.max(SimulationStep.imbalance).label("imbalance"),
+            func.avg(SimulationStep.active_particles).label("active_particles"),
+        )
+        .filter(SimulationStep.job_id == job_id)
+        .group_by(bucket)
+        .order_by(bucket)
+        .all()
+    )
+
+    return JobSteps(
+        job_id=job_id,
+        total_steps=total_steps,
+        steps_per_point=width,
+        steps=[StepStats(**row._mapping) for row in rows],
+    )
+
+
+def _parse_byte_range(header: str, size: int) -> Tuple[int, int]:
+    """Parse a single ``bytes=start-end`` Range header against a log size."""
+    unit, _, spec = header.partition("=")
+    start_text, sep, end_text = spec.strip().partition("-")
+    try:
+        if unit.strip() != "bytes" or not sep or "," in spec:
+            raise ValueError
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=f"Invalid Range header: {header}",
+        )
+    end = min(end, size - 1)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=f"Range not satisfiable for log of {size} bytes",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+@router.get("/jobs/{job_id}/logs", response_class=PlainTextResponse)
+def get_job_logs(
+    job_id: str,
+    tail: int = Query(100, ge=1, le=10000, description="Number of lines"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: Session = Depends(get_db),
+    cache: redis.Redis = Depends(get_redis),
+):
+    """
+    Get simulator output for a job.
+
+    Returns the last ``tail`` lines, from the live Redis tail while the job
+    runs and from the stored compressed log afterwards. A ``Range`` header
+    selects bytes of the uncompressed log and returns ``206``.
+    """
+    job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found",
+        )
+
+    if range_header is None:
+        try:
+            lines = cache.lrange(live_tail_key(job_id), -tail, -1)
+        except redis.RedisError:
+            lines = []
+        if len(lines) >= tail or not job.log_path:
+            return PlainTextResponse("\n".join(lines))
+
+    if not job.log_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No stored log for job {job_id}",
+        )
+
+    storage = get_storage()
+    key = log_object_key(job_id)
+    index = json.loads(storage.read_bytes(key + INDEX_SUFFIX))
+
+    def read(start: int, end: int) -> bytes:
+        return storage.read_bytes(key, start, end)
+
+    if range_header is None:
+        return PlainTextResponse("\n".join(read_log_tail(read, index, tail)))
+
+    start, end = _parse_byte_range(range_header, index["size"])
+    return Response(
+        content=read_log_range(read, index, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type="text/plain",
+        headers={
+            "Content-Range": f"bytes {start}-{end}/{index['size']}",
+            "Accept-Ranges": "bytes",
+        },
+    )
+
+
+def _snapshot_key(job_id: str, snapshot: int, suffix: str) -> str:
+    """Return the storage key of a per-snapshot output file."""
+    return f"{job_id}/output/snapshot_{snapshot:03d}{suffix}"
+
+
+# Spatial indexes and cell offset tables of completed jobs never change
+_region_cache = TileCache(settings.region_cache_bytes)
+
+
+@router.post(
+    "/jobs/{job_id}/snapshots/{snapshot}/region", response_model=RegionParticles
+)
+def query_snapshot_region(
+    job_id: str,
+    snapshot: int,
+    region: RegionQuery,
+    db: Session = Depends(get_db),
+):
+    """
+    Get the particles of a snapshot inside a box or sphere.
+
+    Reads only the cells of the snapshot's spatial index that overlap the
+    region, so the cost scales with the region rather than the snapshot. The
+    index and its cell offsets are cached in process.
+    """
+    job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found",
+        )
+
+    storage = get_storage()
+    key = _snapshot_key(job_id, snapshot, CELLS_SUFFIX)
+    index = _region_cache.get((key, "index"))
+    if index is None:
+        if not storage.exists(key + INDEX_SUFFIX):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No spatial index for snapshot {snapshot} of job {job_id}",
+            )
+        index = storage.read_bytes(key + INDEX_SUFFIX)
+        _region_cache.put((key, "index"), index)
+    index = json.loads(index)
+    part_type = f"PartType{region.part_type}"
+    if part_type not in index["part_types"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Snapshot {snapshot} has no particles of type {region.part_type}",
+        )
+
+    if region.center is not None:
+        lower = [c - region.radius for c in region.center]
+        upper = [c + region.radius for c in region.center]
+        sphere = (region.center, region.radius)
+    else:
+        lower, upper, sphere = region.lower, region.upper, None
+
+    def read(start: int, end: int) -> bytes:
+        return storage.read_bytes(key, start, end)
+
+    offsets_field = index["part_types"][part_type]["fields"]["CellOffsets"]
+    offsets = _region_cache.get((key, part_type))
+    if offsets is None:
+        offsets = read_cell_offsets(read, index, part_type).tobytes()
+        _region_cache.put((key, part_type), offsets)
+
+    try:
+        particles, bytes_read = query_region(
+            read,
+            index,
+            part_type,
+            lower,
+            upper,
+            sphere,
+            max_particles=settings.region_max_particles,
+            cell_offsets=np.frombuffer(offsets, dtype=offsets_field["dtype"]),
+        )
+    except RegionTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)
+        )
+
+    def column(name: str) -> Optional[list]:
+        return particles[name].tolist() if name in particles else None
+
+    return RegionParticles(
+        job_id=job_id,
+        snapshot=snapshot,
+        part_type=region.part_type,
+        count=len(particles["Coordinates"]),
+        bytes_read=bytes_read,
+        ids=column("ParticleIDs"),
+        positions=column("Coordinates"),
+        velocities=column("Velocities"),
+        masses=column("Masses"),
+    )
+
+
+# Tiles and pyramid indexes of completed jobs never change
+_tile_cache = TileCache(settings.preview_cache_bytes)
+
+
+@router.get(
+    "/jobs/{job_id}/preview/{snapshot}/{z}/{x}/{y}",
+    response_class=Response,
+    responses={200: {"content": {"image/png": {}}}},
+)
+def get_preview_tile(
+    job_id: str,
+    snapshot: int,
+    z: int,
+    x: int,
+    y: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Get a projected-density preview tile of a snapshot as a PNG.
+
+    Zoom ``z`` has 2^z × 2^z tiles with ``y = 0`` at the top. Tiles are
+    served from an in-process LRU cache, fetched with one range read on a
+    miss, and are cacheable by clients (``ETag``/``If-None-Match``).
+    """
+    tile = _tile_cache.get((job_id, snapshot, z, x, y))
+    if tile is None:
+        job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
+
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Job {job_id} not found",
+            )
+
+        storage = get_storage()
+        key = _snapshot_key(job_id, snapshot, PREVIEW_SUFFIX)
+        index = _tile_cache.get((job_id, snapshot, "index"))
+        if index is None:
+            if not storage.exists(key + INDEX_SUFFIX):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"No preview for snapshot {snapshot} of job {job_id}",
+                )
+            index = storage.read_bytes(key + INDEX_SUFFIX)
+            _tile_cache.put((job_id, snapshot, "index"), index)
+
+        entry = json.loads(index)["tiles"].get(f"{z}/{x}/{y}")
+        if entry is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No tile {z}/{x}/{y} in the preview of snapshot {snapshot}",
+            )
+        offset, length = entry
+        tile = storage.read_bytes(key, offset, offset + length - 1)
+        _tile_cache.put((job_id, snapshot, z, x, y), tile)
+
+    etag = f'"{hashlib.sha1(tile).hexdigest()[:16]}"'
+    headers = {
+        "Cache-Control": f"public, max-age={settings.preview_max_age}, immutable",
+        "ETag": etag,
+    }
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=tile, media_type="image/png", headers=headers)
+
+
 @router.delete("/jobs/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_job(job_id: str, db: Session = Depends(get_db)):
     """Cancel a simulation job."""
@@ -0,0 +1,64 @@
+"""API endpoints for queue depth and autoscaling metrics."""
+
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy.orm import Session
+
+from common.database import get_db
+from common.queues import collect_queue_stats
+from common.redis_client import get_broker_redis
+from common.schemas import QueueStatsList
+
+router = APIRouter()
+
+
+class QueueStatsCollector:
+    """Prometheus collector exposing a pre-computed queue snapshot."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def collect(self):
+        gauges = {
+            "pending_jobs": GaugeMetricFamily(
+                "gadget4_queue_pending_jobs",
+                "Jobs in PENDING state per simulator queue",
+                labels=["queue"],
+            ),
+            "queued_messages": GaugeMetricFamily(
+                "gadget4_queue_messages",
+                "Task messages waiting in the broker per simulator queue",
+                labels=["queue"],
+            ),
+            "pending_core_hours": GaugeMetricFamily(
+                "gadget4_queue_pending_core_hours",
+                "Estimated core-hours of pending work per simulator queue",
+                labels=["queue"],
+            ),
+            "oldest_pending_age_seconds": GaugeMetricFamily(
+                "gadget4_queue_oldest_pending_age_seconds",
+                "Age of the oldest pending job per simulator queue",
+                labels=["queue"],
+            ),
+        }
+        for stat in self.stats:
+            for field, gauge in gauges.items():
+                gauge.add_metric([stat.queue], getattr(stat, field))
+        yield from gauges.values()
+
+
+@router.get("/queues", response_model=QueueStatsList)
+async def get_queue_stats(
+    db: Session = Depends(get_db), broker=Depends(get_broker_redis)
+):
+    """Get pending demand for each simulator queue."""
+    return QueueStatsList(queues=collect_queue_stats(db, broker))
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(db: Session = Depends(get_db), broker=Depends(get_broker_redis)):
+    """Expose queue demand in Prometheus text format for autoscalers."""
+    registry = CollectorRegistry()
+    registry.register(QueueStatsCollector(collect_queue_stats(db, broker)))
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
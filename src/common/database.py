@@ -1,9 +1,10 @@
 """Database connection and session management."""
 
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import Generator, Iterator
 
 from .config import settings
 
@@ -12,8 +13,8 @@ engine = create_engine(
     settings.database_url,
     echo=settings.database_echo,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=settings.database_pool_size,
+    max_overflow=settings.database_max_overflow,
 )
 
 # Create SessionLocal class
@@ -32,6 +33,27 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Provide a short-lived transactional session.
+
+    Commits on success and rolls back on error; the pooled connection is
+    returned as soon as the block exits. Long-running code (e.g. workers
+    waiting on a simulation) should use one scope per state transition
+    instead of holding a session open.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def init_db() -> None:
     """Initialize database tables."""
     Base.metadata.create_all(bind=engine)
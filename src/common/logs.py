@@ -0,0 +1,234 @@
+"""Bounded, compressed capture of simulator output.
+
+Simulator stdout is teed into two places:
+
+* a live tail: a ring buffer of the most recent lines, mirrored into a
+  capped Redis list so the API can serve it while the job is running;
+* a compressed log file made of independent gzip members of
+  ``log_chunk_bytes`` uncompressed bytes each. A small JSON index next to it
+  maps uncompressed offsets to member offsets, so byte ranges and tails can
+  be served by fetching only the members that cover them.
+
+The concatenated members are a valid gzip stream, so ``zcat`` still works.
+"""
+
+import bisect
+import gzip
+import json
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import redis
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+LOG_FILENAME = "simulation.log.gz"
+INDEX_SUFFIX = ".idx"
+
+# Callable reading the inclusive byte range [start, end] of the compressed log
+RangeReader = Callable[[int, int], bytes]
+
+
+def live_tail_key(job_id: str) -> str:
+    """Return the Redis key holding a job's live log tail."""
+    return f"job:{job_id}:log"
+
+
+def log_object_key(job_id: str) -> str:
+    """Return the storage key of a job's compressed log."""
+    return f"{job_id}/{LOG_FILENAME}"
+
+
+class CompressedLogWriter:
+    """Write a log as a sequence of indexed gzip members."""
+
+    def __init__(
+        self,
+        path: Path,
+        chunk_bytes: int = settings.log_chunk_bytes,
+        max_bytes: int = settings.log_max_bytes,
+    ):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + INDEX_SUFFIX)
+        self.chunk_bytes = chunk_bytes
+        self.max_bytes = max_bytes
+        self.size = 0  # Uncompressed bytes accepted
+        self.compressed_size = 0
+        self.truncated = False
+        self.members: List[List[int]] = []  # [uncompressed, compressed] offsets
+        self._buffer = bytearray()
+        self._file = open(self.path, "wb")
+
+    def write(self, data: bytes) -> None:
+        """Append data, dropping everything past ``max_bytes``."""
+        if self.truncated:
+            return
+        if self.size + len(data) > self.max_bytes:
+            data = data[: self.max_bytes - self.size]
+            marker = f"\n[log truncated at {self.max_bytes} bytes]\n".encode()
+            data += marker
+            self.truncated = True
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.chunk_bytes:
+            self._write_member(bytes(self._buffer[: self.chunk_bytes]))
+            del self._buffer[: self.chunk_bytes]
+
+    def _write_member(self, chunk: bytes) -> None:
+        member = gzip.compress(chunk)
+        self.members.append([self.size - len(self._buffer), self.compressed_size])
+        self._file.write(member)
+        self.compressed_size += len(member)
+
+    def close(self) -> None:
+        """Flush the last member and write the index."""
+        if self._file.closed:
+            return
+        if self._buffer:
+            self._write_member(bytes(self._buffer))
+            self._buffer.clear()
+        self._file.close()
+        self.index_path.write_text(
+            json.dumps(
+                {
+                    "size": self.size,
+                    "compressed_size": self.compressed_size,
+                    "truncated": self.truncated,
+                    "members": self.members,
+                }
+            )
+        )
+
+
+class LogCapture:
+    """
+    Tee simulator output lines into a live tail and a compressed log.
+
+    Tail lines are published to Redis every ``flush_interval`` seconds by a
+    background thread, so the last lines before a silent phase or a hang
+    reach Redis without waiting for more output. The reader only appends
+    under a short lock and never talks to Redis itself, so a slow Redis
+    cannot stall the simulator's output pipe.
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        path: Path,
+        cache: Optional[redis.Redis] = None,
+        flush_interval: float = 1.0,
+    ):
+        self.job_id = job_id
+        self.writer = CompressedLogWriter(path)
+        self.cache = cache
+        self.flush_interval = flush_interval
+        self.tail = deque(maxlen=settings.log_tail_lines)
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+        if cache is not None:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically,
+                name=f"log-flush-{job_id}",
+                daemon=True,
+            )
+            self._flusher.start()
+
+    @property
+    def path(self) -> Path:
+        return self.writer.path
+
+    @property
+    def index_path(self) -> Path:
+        return self.writer.index_path
+
+    def write(self, line: str) -> None:
+        """Record one line of simulator output."""
+        self.writer.write(line.encode("utf-8", errors="replace"))
+        line = line.rstrip("\n")
+        with self._lock:
+            self.tail.append(line)
+            self._pending.append(line)
+            # Never hold more than one ring buffer's worth while Redis is down
+            if len(self._pending) > 2 * settings.log_tail_lines:
+                del self._pending[: -settings.log_tail_lines]
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Publish pending lines to the capped Redis list."""
+        if self.cache is None:
+            return
+        # Swap the lines out so the reader is not blocked while publishing
+        with self._lock:
+            pending = self._pending[-settings.log_tail_lines :]
+            self._pending = []
+        if not pending:
+            return
+        key = live_tail_key(self.job_id)
+        try:
+            pipe = self.cache.pipeline(transaction=False)
+            pipe.rpush(key, *pending)
+            pipe.ltrim(key, -settings.log_tail_lines, -1)
+            pipe.expire(key, settings.log_tail_ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not publish log tail for job {self.job_id}: {e}")
+            with self._lock:
+                self._pending = pending + self._pending
+
+    def close(self) -> None:
+        """Stop the flusher, publish the live tail and finish the log."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self.writer.close()
+
+
+def _member_range(index: dict, i: int) -> tuple:
+    members = index["members"]
+    start = members[i][1]
+    if i + 1 < len(members):
+        end = members[i + 1][1] - 1
+    else:
+        end = index["compressed_size"] - 1
+    return start, end
+
+
+def read_log_range(read: RangeReader, index: dict, start: int, end: int) -> bytes:
+    """
+    Read the inclusive uncompressed byte range ``start``-``end`` of a log.
+
+    Only the gzip members overlapping the range are fetched.
+    """
+    members = index["members"]
+    end = min(end, index["size"] - 1)
+    if not members or start > end:
+        return b""
+    offsets = [member[0] for member in members]
+    first = bisect.bisect_right(offsets, start) - 1
+    last = bisect.bisect_right(offsets, end) - 1
+    c_start = _member_range(index, first)[0]
+    c_end = _member_range(index, last)[1]
+    data = gzip.decompress(read(c_start, c_end))
+    base = members[first][0]
+    return data[start - base : end - base + 1]
+
+
+def read_log_tail(read: RangeReader, index: dict, lines: int) -> List[str]:
+    """Read the last ``lines`` lines of a log, fetching members from the end."""
+    data = b""
+    i = len(index["members"])
+    while i > 0 and data.count(b"\n") <= lines:
+        i -= 1
+        data = gzip.decompress(read(*_member_range(index, i))) + data
+    return data.decode("utf-8", errors="replace").splitlines()[-lines:]
@@ -6,12 +6,14 @@ from sqlalchemy import (
     Column,
     String,
     Integer,
+    Boolean,
     Float,
     DateTime,
     JSON,
+    ForeignKey,
     Enum as SQLEnum,
 )
-from sqlalchemy.sql import func
+from sqlalchemy.sql import false, func
 
 from .database import Base
 
@@ -25,6 +27,12 @@ class JobStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class SimulatorType(str, Enum):
+    """Simulator enumeration; each simulator has its own worker queue."""
+    GADGET4 = "gadget4"
+    CONCEPT = "concept"
+
+
 class SimulationJob(Base):
     """Simulation job model."""
     __tablename__ = "simulation_jobs"
@@ -33,6 +41,14 @@ class SimulationJob(Base):
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
 
+    # Simulator
+    simulator_type = Column(
+        SQLEnum(SimulatorType),
+        default=SimulatorType.GADGET4,
+        nullable=False,
+        index=True,
+    )
+
     # Status
     status = Column(
         SQLEnum(JobStatus),
@@ -46,10 +62,12 @@ class SimulationJob(Base):
     num_particles = Column(Integer, nullable=False)
     box_size = Column(Float, nullable=False)  # Mpc/h
     parameters = Column(JSON, nullable=True)  # Additional Gadget4 parameters
+    tuned_parameters = Column(JSON, nullable=True)  # Auto-tuner choices
 
     # Results
     result_path = Column(String, nullable=True)  # Path in GCS/S3
     output_files = Column(JSON, nullable=True)  # List of output files
+    log_path = Column(String, nullable=True)  # Compressed simulator log
 
     # Timing
     created_at = Column(
@@ -59,9 +77,18 @@ class SimulationJob(Base):
     )
     started_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    timings = Column(JSON, nullable=True)  # Per-phase timing record
+    profile = Column(  # Capture a cProfile of the worker
+        Boolean, default=False, server_default=false(), nullable=False
+    )
 
     # Celery task
+    queue = Column(String, nullable=True, index=True)  # Worker class queue
     celery_task_id = Column(String, nullable=True, index=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)  # Packed batch claim
+
+    # Client-supplied Idempotency-Key used to deduplicate submissions
+    idempotency_key = Column(String, nullable=True, unique=True, index=True)
 
     # Error tracking
     error_message = Column(String, nullable=True)
@@ -72,3 +99,31 @@ class SimulationJob(Base):
             f"<SimulationJob(id={self.id}, name={self.name}, "
             f"status={self.status})>"
         )
+
+
+class SimulationStep(Base):
+    """Per-step Gadget4 performance record parsed from its log files."""
+    __tablename__ = "simulation_steps"
+
+    job_id = Column(
+        String,
+        ForeignKey("simulation_jobs.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    step = Column(Integer, primary_key=True)
+    time = Column(Float, nullable=True)  # Scale factor or simulation time
+
+    # Wall-clock seconds spent in the step (cpu.txt)
+    total_seconds = Column(Float, nullable=True)
+    tree_seconds = Column(Float, nullable=True)
+    pm_seconds = Column(Float, nullable=True)
+    domain_seconds = Column(Float, nullable=True)
+    io_seconds = Column(Float, nullable=True)
+
+    # Work-load balance of the gravity calculation (timings.txt; 1 is perfect)
+    imbalance = Column(Float, nullable=True)
+    # Particles active in the step (balance.txt)
+    active_particles = Column(Integer, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<SimulationStep(job_id={self.job_id}, step={self.step})>"
@@ -0,0 +1,182 @@
+"""Simulator parameter set construction shared by the API and workers."""
+
+import ast
+import keyword
+from typing import Any, Dict, Optional
+
+# Defaults written to every parameter file unless the job overrides them
+DEFAULT_GADGET4_PARAMETERS: Dict[str, Any] = {
+    "OutputDir": "./output",
+    "TimeBetSnapshot": 0.1,
+    "TimeMax": 1.0,
+}
+
+
+def build_gadget4_parameters(
+    box_size: float,
+    num_particles: int,
+    parameters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Build the full Gadget4 parameter set for a job.
+
+    Args:
+        box_size: Simulation box size in Mpc/h
+        num_particles: Number of particles
+        parameters: Additional parameters; these override the defaults
+    """
+    params: Dict[str, Any] = {
+        "BoxSize": box_size,
+        "ParticleNumber": num_particles,
+        **DEFAULT_GADGET4_PARAMETERS,
+    }
+    if parameters:
+        params.update(parameters)
+    return params
+
+
+def format_parameter_file(params: Dict[str, Any]) -> str:
+    """Render a parameter set in Gadget4 parameter file syntax."""
+    return "".join(f"{key:<20} {value}\n" for key, value in params.items())
+
+
+# Names CONCEPT parameter expressions may refer to: units, constants and
+# parameters defined in every CONCEPT parameter file
+CONCEPT_EXPRESSION_NAMES = frozenset(
+    {
+        "boxsize",
+        "N",
+        "h",
+        "a_begin",
+        "a_end",
+        "H0",
+        "π",
+        "pi",
+        "c",
+        "G_Newton",
+        "yr",
+        "kyr",
+        "Myr",
+        "Gyr",
+        "pc",
+        "kpc",
+        "Mpc",
+        "Gpc",
+        "km",
+        "m",
+        "s",
+        "Msun",
+    }
+)
+CONCEPT_EXPRESSION_FUNCTIONS = frozenset(
+    {"sqrt", "cbrt", "exp", "log", "log2", "log10", "sin", "cos", "tan", "abs"}
+)
+CONCEPT_EXPRESSION_MAX_LENGTH = 200
+
+_EXPRESSION_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Constant,
+    ast.Name,
+    ast.Call,
+    ast.Load,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.UAdd,
+    ast.USub,
+)
+
+
+def concept_expression(value: str) -> Optional[str]:
+    """
+    Parse an arithmetic CONCEPT parameter expression.
+
+    Only numbers, the names in ``CONCEPT_EXPRESSION_NAMES``, calls of
+    ``CONCEPT_EXPRESSION_FUNCTIONS`` and arithmetic operators are allowed.
+
+    Returns:
+        The expression re-rendered from its syntax tree, or None if the
+        string is not such an expression
+    """
+    if len(value) > CONCEPT_EXPRESSION_MAX_LENGTH:
+        return None
+    try:
+        tree = ast.parse(value, mode="eval")
+    except SyntaxError:
+        return None
+    for node in ast.walk(tree):
+        if not isinstance(node, _EXPRESSION_NODES):
+            return None
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            return None
+        if isinstance(node, ast.Name) and node.id not in (
+            CONCEPT_EXPRESSION_NAMES | CONCEPT_EXPRESSION_FUNCTIONS
+        ):
+            return None
+        if isinstance(node, ast.Call) and (
+            node.keywords
+            or not isinstance(node.func, ast.Name)
+            or node.func.id not in CONCEPT_EXPRESSION_FUNCTIONS
+        ):
+            return None
+    return ast.unparse(tree)
+
+
+def check_concept_parameter_name(key: str) -> None:
+    """Raise ValueError unless ``key`` is a plain CONCEPT parameter name."""
+    if not key.isidentifier() or keyword.iskeyword(key) or key.startswith("_"):
+        raise ValueError(f"Invalid CONCEPT parameter name: {key!r}")
+
+
+def _concept_value(value: Any) -> str:
+    """
+    Render a CONCEPT parameter value as Python source.
+
+    Strings that are arithmetic expressions (see ``concept_expression``) are
+    written as expressions; everything else is written with ``repr()``.
+    """
+    if isinstance(value, str):
+        expression = concept_expression(value)
+        if expression is not None:
+            return expression
+    return repr(value)
+
+
+def build_concept_parameters(
+    box_size: float,
+    num_particles: int,
+    parameters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, str]:
+    """
+    Build the full CONCEPT parameter set for a job.
+
+    CONCEPT parameter files are Python, so names must be identifiers and
+    values are rendered as Python literals. String values that are arithmetic
+    expressions over CONCEPT's units, constants and functions, such as
+    ``"1.25*boxsize/cbrt(N)"``, are written as expressions.
+
+    Raises:
+        ValueError: If a parameter name is not a plain identifier
+    """
+    params = {
+        "boxsize": f"{box_size}*Mpc/h",
+        "initial_conditions": repr({"species": "matter", "N": num_particles}),
+        "output_dirs": repr("./output"),
+    }
+    for key, value in (parameters or {}).items():
+        check_concept_parameter_name(key)
+        params[key] = _concept_value(value)
+    return params
+
+
+def format_concept_parameter_file(params: Dict[str, str]) -> str:
+    """Render a parameter set in CONCEPT (Python) parameter file syntax."""
+    return "".join(f"{key} = {value}\n" for key, value in params.items())
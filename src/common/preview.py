@@ -0,0 +1,166 @@
+"""Projected-density preview tiles of snapshots.
+
+Each snapshot is projected along z onto a ``preview_tile_size · 2^max_zoom``
+pixel grid in one streaming pass over its particle coordinates. Coarser
+zoom levels are 2×2 sums of the level below. Every level is cut into
+``preview_tile_size``² tiles (zoom ``z`` has 2^z × 2^z tiles, ``y = 0`` at
+the top) and encoded as 8-bit grayscale PNGs of log density.
+
+All tiles of a snapshot are packed into one ``.preview`` file with a JSON
+index (``.idx``) of their byte ranges, so the pyramid is a single
+upload and a tile is a single range read.
+"""
+
+import json
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional
+
+import h5py
+import numpy as np
+
+from .config import settings
+from .logs import INDEX_SUFFIX
+from .spatial import find_snapshots
+
+PREVIEW_SUFFIX = ".preview"
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encode a 2D uint8 array as a grayscale PNG."""
+    height, width = image.shape
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return (
+            struct.pack(">I", len(data))
+            + body
+            + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+        )
+
+    # Filter type 0 (none) at the start of each row
+    raw = np.hstack([np.zeros((height, 1), np.uint8), image]).tobytes()
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def project_density(files: List[Path], pixels: int) -> np.ndarray:
+    """
+    Count particles of all types per pixel, projected along z.
+
+    Returns:
+        Counts indexed by ``[x, y]`` pixel
+    """
+    counts = np.zeros(pixels * pixels, dtype=np.float64)
+    chunk_rows = settings.spatial_index_chunk_rows
+    box_size = None
+    for path in files:
+        with h5py.File(path, "r") as f:
+            box_size = box_size or float(f["Header"].attrs["BoxSize"])
+            for group in f:
+                if not group.startswith("PartType") or "Coordinates" not in f[group]:
+                    continue
+                dataset = f[group]["Coordinates"]
+                for start in range(0, dataset.shape[0], chunk_rows):
+                    xy = dataset[start : start + chunk_rows, :2]
+                    cells = np.floor(xy / box_size * pixels).astype(np.int64)
+                    cells %= pixels
+                    counts += np.bincount(
+                        cells[:, 0] * pixels + cells[:, 1], minlength=counts.size
+                    )
+    return counts.reshape(pixels, pixels)
+
+
+def to_image(counts: np.ndarray) -> np.ndarray:
+    """Map counts to 8-bit log density, north up."""
+    mean = counts.mean() or 1.0
+    density = np.log10(1.0 + counts / mean)
+    peak = density.max() or 1.0
+    image = np.round(density / peak * 255).astype(np.uint8)
+    # Rows are y from the top, columns are x
+    return image.T[::-1]
+
+
+def build_preview(files: List[Path], output: Path) -> Dict[str, list]:
+    """
+    Write the tile pyramid of a snapshot and its index.
+
+    Returns:
+        Index mapping ``"z/x/y"`` to ``[offset, length]``
+    """
+    tile = settings.preview_tile_size
+    max_zoom = settings.preview_max_zoom
+    counts = project_density(files, tile * 2**max_zoom)
+
+    index = {}
+    offset = 0
+    with open(output, "wb") as out:
+        for zoom in range(max_zoom, -1, -1):
+            image = to_image(counts)
+            for x in range(2**zoom):
+                for y in range(2**zoom):
+                    data = encode_png(
+                        image[y * tile : (y + 1) * tile, x * tile : (x + 1) * tile]
+                    )
+                    out.write(data)
+                    index[f"{zoom}/{x}/{y}"] = [offset, len(data)]
+                    offset += len(data)
+            if zoom:
+                n = counts.shape[0] // 2
+                counts = counts.reshape(n, 2, n, 2).sum(axis=(1, 3))
+    Path(str(output) + INDEX_SUFFIX).write_text(
+        json.dumps({"tile_size": tile, "max_zoom": max_zoom, "tiles": index})
+    )
+    return index
+
+
+def build_previews(output_dir: Path) -> List[Path]:
+    """
+    Build the preview pyramid of every HDF5 snapshot in an output directory.
+
+    Returns:
+        Paths of the preview files written
+    """
+    written = []
+    for name, files in find_snapshots(output_dir).items():
+        output = output_dir / f"{name}{PREVIEW_SUFFIX}"
+        build_preview(files, output)
+        written.append(output)
+    return written
+
+
+class TileCache:
+    """Thread-safe LRU cache of bytes values, bounded by total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
@@ -0,0 +1,73 @@
+"""Per-queue demand statistics for autoscaling worker classes."""
+
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import JobStatus, SimulationJob, SimulatorType
+from .schemas import QueueStats
+
+
+def core_hours_per_particle(simulator_type: SimulatorType) -> float:
+    """Return the estimated core-hours needed per particle."""
+    if simulator_type == SimulatorType.CONCEPT:
+        rate = settings.concept_core_hours_per_mparticle
+    else:
+        rate = settings.gadget4_core_hours_per_mparticle
+    return rate / 1_000_000
+
+
+def collect_queue_stats(db: Session, broker) -> List[QueueStats]:
+    """
+    Compute per-queue demand from Postgres and the Celery broker.
+
+    Uses a single aggregate query over pending jobs and one pipelined
+    round trip of ``LLEN`` calls, so it is cheap enough to scrape often.
+
+    Args:
+        db: Database session
+        broker: Redis client connected to the Celery broker
+    """
+    rows = (
+        db.query(
+            SimulationJob.queue,
+            func.count(SimulationJob.id),
+            func.coalesce(func.sum(SimulationJob.num_particles), 0),
+            func.min(SimulationJob.created_at),
+        )
+        .filter(SimulationJob.status == JobStatus.PENDING)
+        .group_by(SimulationJob.queue)
+        .all()
+    )
+    pending = {row[0]: row[1:] for row in rows}
+
+    worker_classes = settings.worker_classes
+    pipe = broker.pipeline(transaction=False)
+    for worker_class in worker_classes:
+        pipe.llen(worker_class.queue)
+    queued = pipe.execute()
+
+    now = datetime.now(timezone.utc)
+    stats = []
+    for worker_class, queued_messages in zip(worker_classes, queued):
+        simulator_type = SimulatorType(worker_class.simulator_type)
+        count, particles, oldest = pending.get(worker_class.queue, (0, 0, None))
+        age = 0.0
+        if oldest is not None:
+            if oldest.tzinfo is None:
+                oldest = oldest.replace(tzinfo=timezone.utc)
+            age = max((now - oldest).total_seconds(), 0.0)
+        stats.append(
+            QueueStats(
+                queue=worker_class.queue,
+                simulator_type=simulator_type,
+                pending_jobs=count,
+                queued_messages=queued_messages,
+                pending_core_hours=particles * core_hours_per_particle(simulator_type),
+                oldest_pending_age_seconds=age,
+            )
+        )
+    return stats
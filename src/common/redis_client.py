@@ -0,0 +1,31 @@
+"""Redis client management."""
+
+import redis
+
+from .config import settings
+
+# Calls fail with a RedisError instead of hanging when Redis is unreachable
+TIMEOUTS = {
+    "socket_timeout": settings.redis_socket_timeout,
+    "socket_connect_timeout": settings.redis_socket_timeout,
+}
+
+# Application Redis (hot state, caches, locks)
+redis_client = redis.Redis.from_url(
+    settings.redis_url, decode_responses=True, **TIMEOUTS
+)
+
+# Celery broker Redis (task queues live here as lists named after the queue)
+broker_client = redis.Redis.from_url(
+    settings.celery_broker_url, decode_responses=True, **TIMEOUTS
+)
+
+
+def get_redis() -> redis.Redis:
+    """Dependency to get the application Redis client."""
+    return redis_client
+
+
+def get_broker_redis() -> redis.Redis:
+    """Dependency to get the Celery broker Redis client."""
+    return broker_client
@@ -0,0 +1,178 @@
+"""Pre-flight resource estimates and worker class routing.
+
+The memory model follows Gadget4's layout: particle data and tree nodes are
+split across MPI ranks (with some load imbalance), the PM grid is slab
+decomposed across ranks, and each rank carries a fixed overhead for MPI
+buffers and the executable. CONCEPT uses the same model with its own
+per-particle cost and a PM grid sized from the particle count.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .config import WorkerClass, settings
+from .models import SimulatorType
+from .parameters import build_concept_parameters, build_gadget4_parameters
+from .schemas import MemoryEstimate, PreflightReport
+
+BYTES_PER_MB = 1024 * 1024
+
+GADGET4_PARTICLE_BYTES = 128  # Particle data, IDs and timestep bins
+GADGET4_TREE_ALLOC_FACTOR = 0.7  # Tree nodes per particle
+GADGET4_TREE_NODE_BYTES = 136
+CONCEPT_PARTICLE_BYTES = 96  # Positions, momenta and work buffers
+CONCEPT_TREE_BYTES = 32  # P3M cell linked lists
+PM_GRID_ARRAYS = 3  # Density, FFT workspace and force/potential
+RANK_OVERHEAD_MB = 300.0
+LOAD_IMBALANCE = 1.2
+MEMORY_HEADROOM = 0.9  # Fraction of pod memory usable by simulator ranks
+
+
+def worker_classes_for(simulator_type: SimulatorType) -> List[WorkerClass]:
+    """Return the worker classes serving a simulator, smallest first."""
+    simulator = SimulatorType(simulator_type).value
+    return sorted(
+        (wc for wc in settings.worker_classes if wc.simulator_type == simulator),
+        key=lambda wc: (wc.memory_gb, wc.cores),
+    )
+
+
+def get_worker_class(queue: Optional[str]) -> Optional[WorkerClass]:
+    """Return the worker class consuming a queue, if configured."""
+    for worker_class in settings.worker_classes:
+        if worker_class.queue == queue:
+            return worker_class
+    return None
+
+
+def pm_grid_size(simulator_type: SimulatorType, num_particles: int) -> int:
+    """Return the PM grid size per dimension used by a run."""
+    if simulator_type == SimulatorType.CONCEPT:
+        return 2 * round(num_particles ** (1 / 3))
+    return settings.gadget4_pmgrid
+
+
+def estimate_memory(
+    simulator_type: SimulatorType, num_particles: int, ranks: int
+) -> MemoryEstimate:
+    """
+    Estimate the memory footprint of a run.
+
+    Args:
+        simulator_type: Simulator running the job
+        num_particles: Number of particles
+        ranks: Number of MPI ranks the run is split over
+    """
+    if simulator_type == SimulatorType.CONCEPT:
+        particle_bytes = CONCEPT_PARTICLE_BYTES
+        tree_bytes = CONCEPT_TREE_BYTES
+    else:
+        particle_bytes = GADGET4_PARTICLE_BYTES
+        tree_bytes = GADGET4_TREE_ALLOC_FACTOR * GADGET4_TREE_NODE_BYTES
+
+    local_particles = num_particles / ranks * LOAD_IMBALANCE
+    grid = pm_grid_size(simulator_type, num_particles)
+    # Slab decomposition cannot use more ranks than grid planes
+    pm_ranks = min(ranks, grid)
+
+    particles_mb = local_particles * particle_bytes / BYTES_PER_MB
+    tree_mb = local_particles * tree_bytes / BYTES_PER_MB
+    pm_grid_mb = PM_GRID_ARRAYS * 8 * grid**3 / pm_ranks / BYTES_PER_MB
+    per_rank_mb = particles_mb + tree_mb + pm_grid_mb + RANK_OVERHEAD_MB
+
+    return MemoryEstimate(
+        ranks=ranks,
+        particles_mb=round(particles_mb, 1),
+        tree_mb=round(tree_mb, 1),
+        pm_grid_mb=round(pm_grid_mb, 1),
+        overhead_mb=RANK_OVERHEAD_MB,
+        per_rank_mb=round(per_rank_mb, 1),
+        total_mb=round(per_rank_mb * ranks, 1),
+    )
+
+
+def preflight(
+    simulator_type: SimulatorType,
+    box_size: float,
+    num_particles: int,
+    parameters: Optional[Dict[str, Any]] = None,
+    db: Optional[Session] = None,
+) -> PreflightReport:
+    """
+    Check whether a job fits any configured worker class.
+
+    Builds the parameter set the worker would run and picks the smallest
+    worker class whose per-rank memory holds the estimated footprint (and,
+    for Gadget4, whose ranks can allocate ``MaxMemSize`` if it is set).
+    Gadget4 parameters then include the values auto-tuning picks for that
+    worker class, using the step statistics of similar runs if ``db`` is
+    given.
+    """
+    simulator_type = SimulatorType(simulator_type)
+    if simulator_type == SimulatorType.GADGET4:
+        params = build_gadget4_parameters(box_size, num_particles, parameters)
+    else:
+        params = build_concept_parameters(box_size, num_particles, parameters)
+    max_mem_size = params.get("MaxMemSize")
+
+    classes = worker_classes_for(simulator_type)
+    if not classes:
+        return PreflightReport(
+            feasible=False,
+            parameters=params,
+            reasons=[f"No worker class configured for {simulator_type.value}"],
+        )
+
+    reasons = []
+    for worker_class in classes:
+        estimate = estimate_memory(simulator_type, num_particles, worker_class.cores)
+        available_mb = (
+            worker_class.memory_gb * 1024 * MEMORY_HEADROOM / worker_class.cores
+        )
+        required_mb = estimate.per_rank_mb
+        if max_mem_size is not None:
+            heap_mb = float(max_mem_size)
+            if heap_mb < required_mb - RANK_OVERHEAD_MB:
+                reasons.append(
+                    f"{worker_class.queue}: MaxMemSize {heap_mb:.0f} MB is below "
+                    f"the estimated {required_mb - RANK_OVERHEAD_MB:.0f} MB per rank"
+                )
+                continue
+            required_mb = max(required_mb, heap_mb + RANK_OVERHEAD_MB)
+        if required_mb > available_mb:
+            reasons.append(
+                f"{worker_class.queue}: needs {required_mb:.0f} MB per rank, "
+                f"{available_mb:.0f} MB available on {worker_class.cores} ranks"
+            )
+            continue
+        tuning = None
+        if simulator_type == SimulatorType.GADGET4 and settings.gadget4_auto_tune:
+            # tuning imports this module
+            from .tuning import similar_runs, tune_gadget4
+
+            history = (
+                similar_runs(db, num_particles, worker_class.queue)
+                if db is not None
+                else None
+            )
+            tuning = tune_gadget4(
+                num_particles, worker_class.cores, available_mb, history, parameters
+            )
+            params = {**params, **tuning["parameters"]}
+        return PreflightReport(
+            feasible=True,
+            queue=worker_class.queue,
+            memory=estimate,
+            worker_memory_per_rank_mb=round(available_mb, 1),
+            parameters=params,
+            tuned_parameters=tuning,
+        )
+
+    return PreflightReport(
+        feasible=False,
+        memory=estimate,
+        worker_memory_per_rank_mb=round(available_mb, 1),
+        parameters=params,
+        reasons=reasons,
+    )
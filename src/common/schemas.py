@@ -1,11 +1,14 @@
 """Pydantic schemas for API requests and responses."""
 
+import math
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
-from .models import JobStatus
+from .config import settings
+from .models import JobStatus, SimulatorType
+from .parameters import check_concept_parameter_name
 
 
 class SimulationJobCreate(BaseModel):
@@ -14,6 +17,9 @@ class SimulationJobCreate(BaseModel):
         ..., min_length=1, max_length=255, description="Job name"
     )
     description: Optional[str] = Field(None, description="Job description")
+    simulator_type: SimulatorType = Field(
+        SimulatorType.GADGET4, description="Simulator to run the job with"
+    )
     num_particles: int = Field(..., gt=0, description="Number of particles")
     box_size: float = Field(
         ..., gt=0, description="Simulation box size in Mpc/h"
@@ -21,6 +27,37 @@ class SimulationJobCreate(BaseModel):
     parameters: Optional[Dict[str, Any]] = Field(
         None, description="Additional Gadget4 parameters"
     )
+    profile: bool = Field(
+        False, description="Capture a cProfile of the worker's Python side"
+    )
+
+    @field_validator("parameters")
+    @classmethod
+    def check_max_mem_size(
+        cls, parameters: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        value = (parameters or {}).get("MaxMemSize")
+        if value is None:
+            return parameters
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            heap_mb = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(
+                f"MaxMemSize must be a number of MB per rank, got {value!r}"
+            )
+        if not (math.isfinite(heap_mb) and heap_mb > 0):
+            raise ValueError("MaxMemSize must be a positive number of MB")
+        return parameters
+
+    @model_validator(mode="after")
+    def check_concept_parameter_names(self) -> "SimulationJobCreate":
+        # CONCEPT parameter files are Python; names must be plain identifiers
+        if self.simulator_type == SimulatorType.CONCEPT:
+            for key in self.parameters or {}:
+                check_concept_parameter_name(key)
+        return self
 
 
 class SimulationJobUpdate(BaseModel):
@@ -38,20 +75,130 @@ class SimulationJobResponse(BaseModel):
     id: str
     name: str
     description: Optional[str]
+    simulator_type: SimulatorType
     status: JobStatus
     progress: float
     num_particles: int
     box_size: float
     parameters: Optional[Dict[str, Any]]
+    tuned_parameters: Optional[Dict[str, Any]] = Field(
+        None, description="Parameters chosen by the auto-tuner, with reasons"
+    )
     result_path: Optional[str]
     output_files: Optional[List[str]]
     created_at: datetime
     started_at: Optional[datetime]
     completed_at: Optional[datetime]
+    queue: Optional[str]
     celery_task_id: Optional[str]
     error_message: Optional[str]
 
 
+class PhaseTiming(BaseModel):
+    """Timing of one phase of a job."""
+    name: str
+    seconds: float
+    bytes: int = Field(0, description="Bytes read or written by the phase")
+    peak_rss_mb: Optional[float] = Field(
+        None,
+        description="Peak RSS of this job's own simulator processes, "
+        "on the phase that ran them",
+    )
+    ok: bool = True
+
+
+class JobTimings(BaseModel):
+    """Per-phase timing record of a job."""
+    job_id: str
+    status: JobStatus
+    phases: List[PhaseTiming]
+    total_seconds: float
+    profile_path: Optional[str] = None
+
+
+class StepStats(BaseModel):
+    """Performance of one Gadget4 step, or the average over a bucket of steps."""
+    step: int = Field(..., description="First step of the bucket")
+    time: Optional[float] = None
+    total_seconds: Optional[float] = None
+    tree_seconds: Optional[float] = None
+    pm_seconds: Optional[float] = None
+    domain_seconds: Optional[float] = None
+    io_seconds: Optional[float] = None
+    imbalance: Optional[float] = Field(
+        None, description="Worst work-load balance in the bucket (1 is perfect)"
+    )
+    active_particles: Optional[float] = None
+
+
+class JobSteps(BaseModel):
+    """Downsampled per-step performance of a job."""
+    job_id: str
+    total_steps: int
+    steps_per_point: int
+    steps: List[StepStats]
+
+
+class RegionQuery(BaseModel):
+    """Box or sphere to select snapshot particles from (periodic)."""
+    part_type: int = Field(1, ge=0, description="Gadget particle type")
+    lower: Optional[List[float]] = Field(
+        None, min_length=3, max_length=3, description="Lower corner of a box"
+    )
+    upper: Optional[List[float]] = Field(
+        None, min_length=3, max_length=3, description="Upper corner of a box"
+    )
+    center: Optional[List[float]] = Field(
+        None, min_length=3, max_length=3, description="Center of a sphere"
+    )
+    radius: Optional[float] = Field(None, gt=0, description="Radius of a sphere")
+
+    @model_validator(mode="after")
+    def check_shape(self) -> "RegionQuery":
+        box = self.lower is not None and self.upper is not None
+        sphere = self.center is not None and self.radius is not None
+        if box == sphere:
+            raise ValueError("Give either lower and upper, or center and radius")
+        if box and any(lo > hi for lo, hi in zip(self.lower, self.upper)):
+            raise ValueError("lower must not exceed upper")
+        return self
+
+
+class RegionParticles(BaseModel):
+    """Particles selected by a region query."""
+    job_id: str
+    snapshot: int
+    part_type: int
+    count: int
+    bytes_read: int = Field(..., description="Bytes fetched from storage")
+    ids: Optional[List[int]] = None
+    positions: List[List[float]]
+    velocities: Optional[List[List[float]]] = None
+    masses: Optional[List[float]] = None
+
+
+class JobStatusQuery(BaseModel):
+    """Job IDs to poll in one request."""
+    ids: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.bulk_status_max_ids,
+        description="Job IDs",
+    )
+
+
+class JobStatusTable(BaseModel):
+    """
+    Compact status of many jobs.
+
+    Each row of ``jobs`` holds the values of ``fields`` in order; timestamps
+    are Unix seconds.
+    """
+    fields: List[str]
+    jobs: List[List[Any]]
+    missing: List[str] = Field(..., description="Requested IDs not found")
+
+
 class SimulationJobList(BaseModel):
     """Schema for list of simulation jobs."""
     jobs: List[SimulationJobResponse]
@@ -60,6 +207,55 @@ class SimulationJobList(BaseModel):
     page_size: int
 
 
+class QueueStats(BaseModel):
+    """Demand signal for a single simulator queue."""
+    queue: str
+    simulator_type: SimulatorType
+    pending_jobs: int = Field(..., description="Jobs in PENDING state")
+    queued_messages: int = Field(
+        ..., description="Task messages waiting in the broker queue"
+    )
+    pending_core_hours: float = Field(
+        ..., description="Estimated core-hours of pending work"
+    )
+    oldest_pending_age_seconds: float = Field(
+        ..., description="Age of the oldest pending job (0 if none)"
+    )
+
+
+class QueueStatsList(BaseModel):
+    """Schema for queue statistics across all simulators."""
+    queues: List[QueueStats]
+
+
+class MemoryEstimate(BaseModel):
+    """Estimated memory footprint of a job, per MPI rank unless noted."""
+    ranks: int
+    particles_mb: float
+    tree_mb: float
+    pm_grid_mb: float
+    overhead_mb: float
+    per_rank_mb: float
+    total_mb: float = Field(..., description="Footprint summed over all ranks")
+
+
+class PreflightReport(BaseModel):
+    """Result of validating whether a job fits a configured worker class."""
+    feasible: bool
+    queue: Optional[str] = Field(
+        None, description="Queue of the smallest worker class that fits"
+    )
+    memory: Optional[MemoryEstimate] = None
+    worker_memory_per_rank_mb: Optional[float] = None
+    parameters: Dict[str, Any] = Field(
+        default_factory=dict, description="Full parameter set that would run"
+    )
+    tuned_parameters: Optional[Dict[str, Any]] = Field(
+        None, description="Gadget4 auto-tuning record for the chosen queue"
+    )
+    reasons: List[str] = Field(default_factory=list)
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
     status: str
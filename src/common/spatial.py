@@ -0,0 +1,366 @@
+"""Spatial index over snapshot particles for region queries.
+
+After a run, each HDF5 snapshot is rewritten with its particles sorted by
+cell of a regular ``grid``³ mesh over the box (x-major cell order), next to
+a ``CellOffsets`` table giving the first row of every cell. The datasets use
+contiguous, uncompressed storage, so a JSON sidecar (``<file>.idx``) can
+record each dataset's byte offset within the file. A box or sphere query
+reads the ``CellOffsets`` table in one request (callers cache it), then
+fetches only the particle rows of the cells it overlaps with byte-range
+reads, so the data moved scales with the region rather than the snapshot.
+Row ranges separated by small gaps are fetched together to keep the number
+of requests low. The sorted file is still a regular HDF5 file.
+
+The index is built in two streaming passes over the snapshot (count per
+cell, then scatter rows into memory-mapped scratch arrays), so memory stays
+bounded by ``spatial_index_chunk_rows``.
+"""
+
+import json
+import logging
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import h5py
+import numpy as np
+
+from .config import settings
+from .logs import INDEX_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+CELLS_SUFFIX = ".cells.hdf5"
+INDEXED_FIELDS = ("Coordinates", "Velocities", "ParticleIDs", "Masses")
+
+# Callable reading the inclusive byte range [start, end] of the sorted file
+RangeReader = Callable[[int, int], bytes]
+
+SNAPSHOT_RE = re.compile(r"^(snapshot_\d+)(?:\.\d+)?\.hdf5$")
+
+
+class RegionTooLarge(ValueError):
+    """Raised when a region query would return too many particles."""
+
+
+def find_snapshots(output_dir: Path) -> Dict[str, List[Path]]:
+    """
+    Find the HDF5 snapshots written by a run.
+
+    Handles single-file snapshots (``snapshot_000.hdf5``) and multi-file
+    ones (``snapdir_000/snapshot_000.0.hdf5``, ...).
+
+    Returns:
+        Files of each snapshot, keyed by snapshot name
+    """
+    snapshots: Dict[str, List[Path]] = {}
+    for path in sorted(output_dir.rglob("snapshot_*.hdf5")):
+        match = SNAPSHOT_RE.match(path.name)
+        if match:
+            snapshots.setdefault(match.group(1), []).append(path)
+    for files in snapshots.values():
+        files.sort(key=_file_number)
+    return snapshots
+
+
+def _file_number(path: Path) -> int:
+    """Return N of ``snapshot_000.N.hdf5`` (0 for single-file snapshots)."""
+    parts = path.name.split(".")
+    return int(parts[1]) if len(parts) > 2 else 0
+
+
+def read_chunks(
+    files: List[Path], group: str, field: str, chunk_rows: int
+) -> Iterator[np.ndarray]:
+    """Yield a field of a particle type in row chunks across snapshot files."""
+    for path in files:
+        with h5py.File(path, "r") as f:
+            if group not in f or field not in f[group]:
+                continue
+            dataset = f[group][field]
+            for start in range(0, dataset.shape[0], chunk_rows):
+                yield dataset[start : start + chunk_rows]
+
+
+def cell_ids(positions: np.ndarray, box_size: float, grid: int) -> np.ndarray:
+    """Return the x-major cell index of each position."""
+    cells = np.floor(positions / (box_size / grid)).astype(np.int64) % grid
+    return (cells[:, 0] * grid + cells[:, 1]) * grid + cells[:, 2]
+
+
+def _part_types(files: List[Path]) -> Dict[str, Dict[str, Any]]:
+    """Return the particle count and field layout of each particle type."""
+    part_types: Dict[str, Dict[str, Any]] = {}
+    for path in files:
+        with h5py.File(path, "r") as f:
+            for group in f:
+                if not group.startswith("PartType") or "Coordinates" not in f[group]:
+                    continue
+                info = part_types.setdefault(group, {"count": 0, "fields": {}})
+                info["count"] += f[group]["Coordinates"].shape[0]
+                for field in INDEXED_FIELDS:
+                    if field in f[group]:
+                        dataset = f[group][field]
+                        info["fields"][field] = (dataset.dtype, dataset.shape[1:])
+    return part_types
+
+
+def build_spatial_index(
+    files: List[Path], output: Path, grid: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Write a cell-sorted copy of a snapshot and its JSON sidecar.
+
+    Args:
+        files: HDF5 files of one snapshot
+        output: Path of the sorted file; the sidecar is ``output`` + ``.idx``
+        grid: Cells per dimension (``spatial_index_grid`` by default)
+
+    Returns:
+        The sidecar index
+    """
+    grid = grid or settings.spatial_index_grid
+    chunk_rows = settings.spatial_index_chunk_rows
+    with h5py.File(files[0], "r") as f:
+        box_size = float(f["Header"].attrs["BoxSize"])
+        header = dict(f["Header"].attrs)
+
+    part_types = _part_types(files)
+    with (
+        h5py.File(output, "w") as out,
+        tempfile.TemporaryDirectory(dir=output.parent) as scratch,
+    ):
+        out_header = out.create_group("Header")
+        for name, value in header.items():
+            out_header.attrs[name] = value
+        out_header.attrs["IndexGrid"] = grid
+
+        for group, info in part_types.items():
+            # Pass 1: particles per cell
+            counts = np.zeros(grid**3, dtype=np.int64)
+            for positions in read_chunks(files, group, "Coordinates", chunk_rows):
+                counts += np.bincount(
+                    cell_ids(positions, box_size, grid), minlength=grid**3
+                )
+            offsets = np.concatenate(([0], np.cumsum(counts)))
+
+            # Pass 2: scatter rows to their sorted position in scratch arrays
+            scratch_arrays = {
+                field: np.lib.format.open_memmap(
+                    Path(scratch) / f"{group}-{field}.npy",
+                    mode="w+",
+                    dtype=dtype,
+                    shape=(info["count"], *shape),
+                )
+                for field, (dtype, shape) in info["fields"].items()
+            }
+            cursor = offsets[:-1].copy()
+            readers = {
+                field: read_chunks(files, group, field, chunk_rows)
+                for field in scratch_arrays
+            }
+            for positions in readers.pop("Coordinates"):
+                cells = cell_ids(positions, box_size, grid)
+                order = np.argsort(cells, kind="stable")
+                sorted_cells = cells[order]
+                unique, first, run = np.unique(
+                    sorted_cells, return_index=True, return_counts=True
+                )
+                rank = np.arange(len(order)) - np.repeat(first, run)
+                dest = cursor[sorted_cells] + rank
+                cursor[unique] += run
+                scratch_arrays["Coordinates"][dest] = positions[order]
+                for field, reader in readers.items():
+                    scratch_arrays[field][dest] = next(reader)[order]
+
+            # Copy into contiguous datasets so byte offsets are stable
+            out_group = out.create_group(group)
+            out_group.create_dataset("CellOffsets", data=offsets)
+            for field, array in scratch_arrays.items():
+                dataset = out_group.create_dataset(
+                    field, shape=array.shape, dtype=array.dtype
+                )
+                for start in range(0, array.shape[0], chunk_rows):
+                    dataset[start : start + chunk_rows] = array[
+                        start : start + chunk_rows
+                    ]
+            # Release the memory maps before the scratch directory goes
+            del scratch_arrays, array
+
+    index: Dict[str, Any] = {"grid": grid, "box_size": box_size, "part_types": {}}
+    with h5py.File(output, "r") as f:
+        for group in part_types:
+            index["part_types"][group] = {
+                "count": part_types[group]["count"],
+                "fields": {
+                    name: {
+                        "offset": f[group][name].id.get_offset(),
+                        "dtype": f[group][name].dtype.str,
+                        "shape": list(f[group][name].shape),
+                    }
+                    for name in f[group]
+                },
+            }
+    Path(str(output) + INDEX_SUFFIX).write_text(json.dumps(index))
+    return index
+
+
+def index_snapshots(output_dir: Path) -> List[Path]:
+    """
+    Build the spatial index of every HDF5 snapshot in an output directory.
+
+    Returns:
+        Paths of the sorted snapshot files written
+    """
+    written = []
+    for name, files in find_snapshots(output_dir).items():
+        output = output_dir / f"{name}{CELLS_SUFFIX}"
+        index = build_spatial_index(files, output)
+        logger.info(
+            f"Indexed {name} on a {index['grid']}^3 grid "
+            f"({sum(p['count'] for p in index['part_types'].values())} particles)"
+        )
+        written.append(output)
+    return written
+
+
+def _axis_cells(lo: float, hi: float, cell_size: float, grid: int) -> List[int]:
+    """Return the cells along one axis overlapping [lo, hi], wrapping around."""
+    first = int(np.floor(lo / cell_size))
+    last = int(np.floor(hi / cell_size))
+    if last - first + 1 >= grid:
+        return list(range(grid))
+    return sorted({i % grid for i in range(first, last + 1)})
+
+
+def _runs(values: List[Tuple[int, int]], gap: int = 0) -> List[Tuple[int, int]]:
+    """Merge inclusive ranges that overlap or are at most ``gap`` apart."""
+    merged: List[List[int]] = []
+    for start, end in sorted(values):
+        if merged and start <= merged[-1][1] + 1 + gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _read_rows(
+    read: RangeReader, field: Dict[str, Any], start: int, stop: int
+) -> Tuple[np.ndarray, int]:
+    """Read rows [start, stop) of a contiguous dataset."""
+    dtype = np.dtype(field["dtype"])
+    row_shape = tuple(field["shape"][1:])
+    row_bytes = dtype.itemsize * int(np.prod(row_shape, dtype=np.int64))
+    if stop <= start:
+        return np.empty((0, *row_shape), dtype=dtype), 0
+    begin = field["offset"] + start * row_bytes
+    data = read(begin, begin + (stop - start) * row_bytes - 1)
+    return np.frombuffer(data, dtype=dtype).reshape(-1, *row_shape), len(data)
+
+
+def read_cell_offsets(
+    read: RangeReader, index: Dict[str, Any], part_type: str
+) -> np.ndarray:
+    """Read the whole ``CellOffsets`` table of a particle type in one request."""
+    field = index["part_types"][part_type]["fields"]["CellOffsets"]
+    return _read_rows(read, field, 0, field["shape"][0])[0]
+
+
+def query_region(
+    read: RangeReader,
+    index: Dict[str, Any],
+    part_type: str,
+    lower: Tuple[float, float, float],
+    upper: Tuple[float, float, float],
+    sphere: Optional[Tuple[Tuple[float, float, float], float]] = None,
+    max_particles: Optional[int] = None,
+    cell_offsets: Optional[np.ndarray] = None,
+    gap_rows: Optional[int] = None,
+) -> Tuple[Dict[str, np.ndarray], int]:
+    """
+    Return the particles inside a periodic box, or a sphere within it.
+
+    Args:
+        read: Reads a byte range of the sorted snapshot file
+        index: Sidecar index of the sorted file
+        part_type: Particle type group, e.g. ``"PartType1"``
+        lower: Lower corner of the box; may be negative to wrap around
+        upper: Upper corner of the box
+        sphere: Optional ``(center, radius)``; the box should bound it
+        max_particles: Refuse regions whose cells hold more particles
+        cell_offsets: The ``CellOffsets`` table, if already read
+        gap_rows: Read row ranges this close together at once
+            (``region_read_gap_rows`` by default)
+
+    Returns:
+        Field arrays of the matching particles and the bytes read
+
+    Raises:
+        RegionTooLarge: If the overlapping cells exceed ``max_particles``
+    """
+    grid = index["grid"]
+    box_size = index["box_size"]
+    fields = index["part_types"][part_type]["fields"]
+    cell_size = box_size / grid
+    lower_arr = np.asarray(lower, dtype=np.float64)
+    upper_arr = np.asarray(upper, dtype=np.float64)
+
+    # Cell index ranges: z-runs are contiguous, and so are full planes
+    xs, ys, zs = (
+        _axis_cells(lower_arr[i], upper_arr[i], cell_size, grid) for i in range(3)
+    )
+    z_runs = _runs([(z, z) for z in zs])
+    cell_ranges = _runs(
+        [
+            ((x * grid + y) * grid + z0, (x * grid + y) * grid + z1)
+            for x in xs
+            for y in ys
+            for z0, z1 in z_runs
+        ]
+    )
+
+    bytes_read = 0
+    if cell_offsets is None:
+        cell_offsets = read_cell_offsets(read, index, part_type)
+        bytes_read += cell_offsets.nbytes
+    row_ranges = [
+        (int(cell_offsets[c0]), int(cell_offsets[c1 + 1]) - 1) for c0, c1 in cell_ranges
+    ]
+    row_ranges = [(s, e) for s, e in _runs(row_ranges) if e >= s]
+    candidates = sum(e - s + 1 for s, e in row_ranges)
+    if max_particles is not None and candidates > max_particles:
+        raise RegionTooLarge(
+            f"Region overlaps {candidates} particles; the limit is {max_particles}"
+        )
+    # Rows in the gaps are read too and dropped by the exact selection below
+    if gap_rows is None:
+        gap_rows = settings.region_read_gap_rows
+    row_ranges = _runs(row_ranges, gap_rows)
+
+    result: Dict[str, List[np.ndarray]] = {
+        name: [] for name in fields if name != "CellOffsets"
+    }
+    for start, end in row_ranges:
+        for name in result:
+            rows, n = _read_rows(read, fields[name], start, end + 1)
+            bytes_read += n
+            result[name].append(rows)
+    arrays = {
+        name: (
+            np.concatenate(parts) if parts else _read_rows(read, fields[name], 0, 0)[0]
+        )
+        for name, parts in result.items()
+    }
+
+    # Exact selection with periodic wrapping
+    positions = arrays["Coordinates"].astype(np.float64)
+    if sphere is None:
+        offset = np.mod(positions - lower_arr, box_size)
+        mask = np.all(offset <= upper_arr - lower_arr, axis=1)
+    else:
+        center, radius = sphere
+        delta = positions - np.asarray(center, dtype=np.float64)
+        delta -= box_size * np.round(delta / box_size)
+        mask = np.einsum("ij,ij->i", delta, delta) <= radius**2
+    return {name: array[mask] for name, array in arrays.items()}, bytes_read
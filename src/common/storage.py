@@ -0,0 +1,181 @@
+"""Result storage backends (GCS, S3 or a local directory)."""
+
+import logging
+import shutil
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend:
+    """Minimal object store interface used for simulation results."""
+
+    def uri(self, key: str) -> str:
+        """Return the public URI of an object key."""
+        raise NotImplementedError
+
+    def upload_file(self, local_path: Path, key: str) -> str:
+        """Upload a local file and return its URI."""
+        raise NotImplementedError
+
+    def read_bytes(
+        self, key: str, start: Optional[int] = None, end: Optional[int] = None
+    ) -> bytes:
+        """Read an object, or the inclusive byte range ``start``-``end``."""
+        raise NotImplementedError
+
+    def download_file(self, key: str, local_path: Path) -> None:
+        """Download an object to a local file."""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        """Check whether an object exists."""
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Store objects under a local directory (development and tests)."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def uri(self, key: str) -> str:
+        return f"file://{self.path(key)}"
+
+    def upload_file(self, local_path: Path, key: str) -> str:
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(local_path, target)
+        return self.uri(key)
+
+    def read_bytes(
+        self, key: str, start: Optional[int] = None, end: Optional[int] = None
+    ) -> bytes:
+        with open(self.path(key), "rb") as f:
+            if start is None:
+                return f.read()
+            f.seek(start)
+            if end is None:
+                return f.read()
+            return f.read(end - start + 1)
+
+    def download_file(self, key: str, local_path: Path) -> None:
+        shutil.copyfile(self.path(key), local_path)
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+
+class GCSStorage(StorageBackend):
+    """Store objects in a Google Cloud Storage bucket."""
+
+    def __init__(self, bucket: str):
+        from google.cloud import storage
+
+        self.bucket_name = bucket
+        self.bucket = storage.Client().bucket(bucket)
+
+    def uri(self, key: str) -> str:
+        return f"gs://{self.bucket_name}/{key}"
+
+    def upload_file(self, local_path: Path, key: str) -> str:
+        self.bucket.blob(key).upload_from_filename(str(local_path))
+        return self.uri(key)
+
+    def read_bytes(
+        self, key: str, start: Optional[int] = None, end: Optional[int] = None
+    ) -> bytes:
+        return self.bucket.blob(key).download_as_bytes(start=start, end=end)
+
+    def download_file(self, key: str, local_path: Path) -> None:
+        self.bucket.blob(key).download_to_filename(str(local_path))
+
+    def exists(self, key: str) -> bool:
+        return self.bucket.blob(key).exists()
+
+
+class S3Storage(StorageBackend):
+    """Store objects in an AWS S3 bucket."""
+
+    def __init__(self, bucket: str):
+        import boto3
+
+        self.bucket_name = bucket
+        self.client = boto3.client("s3")
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket_name}/{key}"
+
+    def upload_file(self, local_path: Path, key: str) -> str:
+        self.client.upload_file(str(local_path), self.bucket_name, key)
+        return self.uri(key)
+
+    def read_bytes(
+        self, key: str, start: Optional[int] = None, end: Optional[int] = None
+    ) -> bytes:
+        kwargs = {}
+        if start is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+        obj = self.client.get_object(Bucket=self.bucket_name, Key=key, **kwargs)
+        return obj["Body"].read()
+
+    def download_file(self, key: str, local_path: Path) -> None:
+        self.client.download_file(self.bucket_name, key, str(local_path))
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError:
+            return False
+        return True
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """Return the configured storage backend."""
+    global _backend
+    if _backend is None:
+        if settings.storage_type == "gcs" and settings.gcs_bucket:
+            _backend = GCSStorage(settings.gcs_bucket)
+        elif settings.storage_type == "s3" and settings.s3_bucket:
+            _backend = S3Storage(settings.s3_bucket)
+        else:
+            if settings.storage_type != "local":
+                logger.warning(
+                    f"No bucket configured for {settings.storage_type} storage, "
+                    f"using local directory {settings.local_storage_dir}"
+                )
+            _backend = LocalStorage(settings.local_storage_dir)
+    return _backend
+
+
+def upload_directory(local_dir: Path, prefix: str) -> Tuple[str, List[str]]:
+    """
+    Upload every file below a directory.
+
+    Args:
+        local_dir: Directory to upload
+        prefix: Object key prefix, e.g. ``"<job_id>/output"``
+
+    Returns:
+        URI of the prefix and the list of uploaded object keys
+    """
+    storage = get_storage()
+    keys = []
+    if local_dir.is_dir():
+        for path in sorted(local_dir.rglob("*")):
+            if path.is_file():
+                key = f"{prefix}/{path.relative_to(local_dir).as_posix()}"
+                storage.upload_file(path, key)
+                keys.append(key)
+    return storage.uri(f"{prefix}/"), keys
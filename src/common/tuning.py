@@ -0,0 +1,185 @@
+"""Auto-tuning of performance-critical Gadget4 parameters.
+
+The tuner picks ``MaxMemSize`` from the memory model and the memory each
+rank of the run is given, refusing runs that do not fit, ``NumFilesPerSnapshot`` from the snapshot size, and
+``TopNodeFactor`` and ``ActivePartFracForNewDomainDecomp`` from the per-step
+statistics of completed runs of similar size on the same queue: persistent
+load imbalance calls for a finer top-level tree and more frequent domain
+decompositions, while a large share of time in the decomposition itself
+calls for the opposite.
+
+Parameters the job sets explicitly always win over tuned values.
+"""
+
+import math
+import statistics
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import JobStatus, SimulationJob, SimulationStep, SimulatorType
+from .resources import RANK_OVERHEAD_MB, estimate_memory
+
+TUNED_PARAMETERS = (
+    "TopNodeFactor",
+    "ActivePartFracForNewDomainDecomp",
+    "MaxMemSize",
+    "NumFilesPerSnapshot",
+)
+
+DEFAULT_TOP_NODE_FACTOR = 2.5
+DEFAULT_ACTIVE_PART_FRAC = 0.01
+MAX_MEM_HEADROOM = 1.5  # Heap allocated over the estimated per-rank need
+SNAPSHOT_BYTES_PER_PARTICLE = 32  # float32 positions/velocities, 64-bit IDs
+SNAPSHOT_FILE_BYTES = 1024**3  # Target size of one snapshot file
+IMBALANCE_THRESHOLD = 1.1  # Work-load balance above which to react
+DOMAIN_FRACTION_THRESHOLD = 0.15  # Share of step time in domain decomposition
+SIMILAR_SIZE_FACTOR = 2.0  # Runs within this factor of particles are similar
+HISTORY_JOBS = 20  # Most recent similar runs considered
+
+
+class InsufficientMemory(ValueError):
+    """The memory given to a run is below its estimated footprint."""
+
+
+@dataclass
+class RunHistory:
+    """Step statistics summarised over similar completed runs."""
+
+    jobs: int
+    imbalance: Optional[float]  # Median over runs of the mean imbalance
+    domain_fraction: Optional[float]  # Share of step time in decomposition
+
+
+def similar_runs(db: Session, num_particles: int, queue: Optional[str]) -> RunHistory:
+    """Summarise the step statistics of recent similar Gadget4 runs."""
+    rows = (
+        db.query(
+            SimulationStep.job_id,
+            func.avg(SimulationStep.imbalance),
+            func.sum(SimulationStep.domain_seconds),
+            func.sum(SimulationStep.total_seconds),
+        )
+        .join(SimulationJob, SimulationJob.id == SimulationStep.job_id)
+        .filter(
+            SimulationJob.status == JobStatus.COMPLETED,
+            SimulationJob.simulator_type == SimulatorType.GADGET4,
+            SimulationJob.queue == queue,
+            SimulationJob.num_particles >= num_particles / SIMILAR_SIZE_FACTOR,
+            SimulationJob.num_particles <= num_particles * SIMILAR_SIZE_FACTOR,
+        )
+        .group_by(SimulationStep.job_id)
+        .order_by(func.max(SimulationJob.completed_at).desc())
+        .limit(HISTORY_JOBS)
+        .all()
+    )
+    imbalances = [row[1] for row in rows if row[1] is not None]
+    domain = sum(row[2] or 0.0 for row in rows)
+    total = sum(row[3] or 0.0 for row in rows)
+    return RunHistory(
+        jobs=len(rows),
+        imbalance=statistics.median(imbalances) if imbalances else None,
+        domain_fraction=domain / total if total > 0 else None,
+    )
+
+
+def tune_gadget4(
+    num_particles: int,
+    ranks: int,
+    memory_per_rank_mb: Optional[float],
+    history: Optional[RunHistory] = None,
+    overrides: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Choose the tuned Gadget4 parameters for a run.
+
+    Args:
+        num_particles: Number of particles
+        ranks: MPI ranks of the run
+        memory_per_rank_mb: Memory available to each rank, if known
+        history: Step statistics of similar runs
+        overrides: Parameters set by the job; tuned values are not used
+            for these
+
+    Returns:
+        Record with the ``parameters`` chosen, the ``reasons`` for each, the
+        parameters ``overridden`` by the job, ``ranks`` and ``history_jobs``
+
+    Raises:
+        InsufficientMemory: If ``MaxMemSize`` is tuned and a rank needs more
+            than ``memory_per_rank_mb``
+    """
+    parameters: Dict[str, Any] = {}
+    reasons: Dict[str, str] = {}
+
+    estimate = estimate_memory(SimulatorType.GADGET4, num_particles, ranks)
+    need_mb = estimate.per_rank_mb - RANK_OVERHEAD_MB
+    heap_mb = need_mb * MAX_MEM_HEADROOM
+    heap_reason = f"{MAX_MEM_HEADROOM}x the estimated {need_mb:.0f} MB per rank"
+    if memory_per_rank_mb is not None:
+        if estimate.per_rank_mb > memory_per_rank_mb and "MaxMemSize" not in (
+            overrides or {}
+        ):
+            raise InsufficientMemory(
+                f"{ranks} ranks need an estimated {estimate.per_rank_mb:.0f} MB "
+                f"each, {memory_per_rank_mb:.0f} MB available"
+            )
+        if heap_mb > memory_per_rank_mb - RANK_OVERHEAD_MB:
+            heap_mb = memory_per_rank_mb - RANK_OVERHEAD_MB
+            heap_reason = (
+                f"capped by the {memory_per_rank_mb:.0f} MB available per rank"
+            )
+    # Rounded down to 100 MB, but never below the estimate
+    parameters["MaxMemSize"] = max(int(heap_mb // 100 * 100), math.ceil(need_mb), 100)
+    reasons["MaxMemSize"] = heap_reason
+
+    snapshot_bytes = num_particles * SNAPSHOT_BYTES_PER_PARTICLE
+    files = min(max(math.ceil(snapshot_bytes / SNAPSHOT_FILE_BYTES), 1), ranks)
+    parameters["NumFilesPerSnapshot"] = files
+    reasons["NumFilesPerSnapshot"] = (
+        f"{snapshot_bytes / 1024**2:.0f} MB snapshots in files of up to "
+        f"{SNAPSHOT_FILE_BYTES // 1024**2} MB, at most one per rank"
+    )
+
+    top_node_factor = DEFAULT_TOP_NODE_FACTOR
+    active_frac = DEFAULT_ACTIVE_PART_FRAC
+    domain_reason = "default; no similar runs with step statistics"
+    if history is not None and history.jobs:
+        domain_reason = f"default; {history.jobs} similar runs look balanced"
+        notes = []
+        if history.imbalance is not None and history.imbalance > IMBALANCE_THRESHOLD:
+            top_node_factor *= min(history.imbalance, 2.0)
+            active_frac /= 2
+            notes.append(f"median imbalance {history.imbalance:.2f}")
+        if (
+            history.domain_fraction is not None
+            and history.domain_fraction > DOMAIN_FRACTION_THRESHOLD
+        ):
+            top_node_factor *= 0.8
+            active_frac *= 2
+            notes.append(
+                f"{history.domain_fraction:.0%} of step time in domain decomposition"
+            )
+        if notes:
+            domain_reason = f"{', '.join(notes)} over {history.jobs} similar runs"
+    parameters["TopNodeFactor"] = round(min(max(top_node_factor, 1.5), 5.0), 2)
+    parameters["ActivePartFracForNewDomainDecomp"] = round(
+        min(max(active_frac, 0.001), 0.2), 4
+    )
+    reasons["TopNodeFactor"] = domain_reason
+    reasons["ActivePartFracForNewDomainDecomp"] = domain_reason
+
+    overridden = sorted(set(overrides or {}) & set(TUNED_PARAMETERS))
+    for name in overridden:
+        del parameters[name]
+        reasons[name] = "set by the job"
+
+    return {
+        "parameters": parameters,
+        "reasons": reasons,
+        "overridden": overridden,
+        "ranks": ranks,
+        "history_jobs": history.jobs if history is not None else 0,
+    }
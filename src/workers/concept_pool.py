@@ -0,0 +1,394 @@
+"""Warm interpreter pool for small CONCEPT jobs.
+
+Launching CONCEPT as a fresh process pays the Python/Cython import and
+initialization cost on every job, which dominates small test runs. Instead,
+each pool member is a long-lived interpreter (started with
+``python -m workers.concept_pool``) that imports the heavy modules once and
+then runs jobs on request.
+
+Only parameter-independent dependencies (``concept_preload_modules``:
+numpy, scipy, h5py, mpi4py) are preloaded. CONCEPT's own modules read the
+parameter file at import and are normally compiled extensions, which can be
+neither re-executed nor safely shared, so each job's child imports them
+fresh (``concept_source_modules`` first, timed) from CONCEPT's source
+directory. Each job reports this per-job ``startup_seconds`` next to the
+``cold_startup_seconds`` the interpreter paid at warm-up.
+
+Isolation: every job runs in a child forked from the warm interpreter, in
+its own working directory, with stdout/stderr redirected to a per-job output
+file. Nothing a job does to module state, the environment or the working
+directory leaks into later jobs, and a crashing job only takes its child
+down.
+
+Recycling: an interpreter is replaced after ``concept_warm_max_jobs`` jobs,
+after ``concept_warm_max_age`` seconds, when it dies, or when a job is
+interrupted (e.g. by a time limit), in which case its whole process group is
+killed.
+"""
+
+import atexit
+import importlib
+import json
+import os
+import runpy
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from common.config import settings
+from common.logs import LogCapture
+from workers.runner import (
+    SimulationError,
+    PeakRssSampler,
+    register_process_group,
+    unregister_process_group,
+)
+
+OUTPUT_FILENAME = "concept.out"
+
+
+class WarmInterpreter:
+    """One warm CONCEPT interpreter process."""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.jobs_run = 0
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "workers.concept_pool"],
+            cwd=str(Path(__file__).parent.parent),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+        )
+        ready = self._read_message(timeout=settings.concept_warm_startup_timeout)
+        self.warmup_seconds = ready["warmup_seconds"]
+
+    def _read_message(self, timeout: Optional[float] = None) -> dict:
+        """Read one JSON message from the interpreter's control channel."""
+        readable, _, _ = select.select([self.process.stdout], [], [], timeout)
+        line = self.process.stdout.readline() if readable else ""
+        if not line:
+            self.kill()
+            raise SimulationError("Warm CONCEPT interpreter stopped responding")
+        return json.loads(line)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def expired(self) -> bool:
+        """Check the recycle policy."""
+        return (
+            not self.alive()
+            or self.jobs_run >= settings.concept_warm_max_jobs
+            or time.monotonic() - self.started_at >= settings.concept_warm_max_age
+        )
+
+    def run(
+        self,
+        param_file: Path,
+        work_dir: Path,
+        capture: LogCapture,
+        on_line: Optional[Callable[[str], None]] = None,
+        cpus: Optional[List[int]] = None,
+    ) -> Dict[str, float]:
+        """
+        Run one job in a child forked from this interpreter.
+
+        Output is followed from the job's output file into ``capture`` while
+        the job runs. ``cpus`` pins the job to a CPU set.
+
+        Returns:
+            Latency from dispatch to job start, per-job startup against the
+            cold startup paid at warm-up, job wall time in seconds, and the
+            job's peak RSS in MB
+        """
+        output_file = work_dir / OUTPUT_FILENAME
+        output_file.touch()
+        dispatched = time.time()
+        self.process.stdin.write(
+            json.dumps(
+                {
+                    "param_file": str(param_file),
+                    "work_dir": str(work_dir),
+                    "output_file": str(output_file),
+                    "cpus": cpus,
+                }
+            )
+            + "\n"
+        )
+        self.process.stdin.flush()
+        self.jobs_run += 1
+
+        def forward(lines: List[str]) -> None:
+            for line in lines:
+                capture.write(line + "\n")
+                if on_line:
+                    on_line(line)
+
+        partial = ""
+        register_process_group(self.process.pid)
+        try:
+            with open(output_file, errors="replace") as output:
+                while True:
+                    readable, _, _ = select.select([self.process.stdout], [], [], 0.2)
+                    # Forward complete lines; keep a trailing partial line
+                    partial += output.read()
+                    *lines, partial = partial.split("\n")
+                    forward(lines)
+                    if readable:
+                        break
+                    if not self.alive():
+                        raise SimulationError(
+                            "Warm CONCEPT interpreter died during a job"
+                        )
+                result = self._read_message()
+                forward((partial + output.read()).splitlines())
+        except BaseException:
+            self.kill()
+            raise
+        finally:
+            unregister_process_group(self.process.pid)
+
+        if result["returncode"] != 0:
+            tail = "\n".join(list(capture.tail)[-5:])
+            raise SimulationError(
+                f"CONCEPT exited with code {result['returncode']}:\n{tail}"
+            )
+        return {
+            "latency_seconds": result["started"] - dispatched,
+            "startup_seconds": result["startup_seconds"],
+            "cold_startup_seconds": self.warmup_seconds,
+            "job_seconds": result["finished"] - result["started"],
+            "peak_rss_mb": result["peak_rss_mb"],
+        }
+
+    def kill(self) -> None:
+        """Kill the interpreter and any job it is running."""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+
+class ConceptWarmPool:
+    """Pool of warm interpreters with a recycle policy."""
+
+    def __init__(self, size: int):
+        self.base_size = size
+        self.size = size
+        self._reservations: List[int] = []
+        self._idle: List[WarmInterpreter] = []
+        self._busy = 0
+        self._lock = threading.Condition()
+        self.warmups = 0
+        self.warmup_seconds = 0.0
+
+    def _acquire(self) -> tuple:
+        """Return an idle interpreter, starting one if needed."""
+        with self._lock:
+            while not self._idle and self._busy >= self.size:
+                self._lock.wait()
+            self._busy += 1
+            interpreter = self._idle.pop() if self._idle else None
+        if interpreter is not None and not interpreter.expired():
+            return interpreter, True
+        if interpreter is not None:
+            interpreter.kill()
+        try:
+            interpreter = WarmInterpreter()
+        except BaseException:
+            self._release(None)
+            raise
+        self.warmups += 1
+        self.warmup_seconds += interpreter.warmup_seconds
+        return interpreter, False
+
+    def _release(self, interpreter: Optional[WarmInterpreter]) -> None:
+        with self._lock:
+            self._busy -= 1
+            if interpreter is not None and interpreter.alive():
+                self._idle.append(interpreter)
+            surplus = self._trim()
+            self._lock.notify()
+        for extra in surplus:
+            extra.kill()
+
+    def _trim(self) -> List[WarmInterpreter]:
+        """Remove idle interpreters beyond the current size; lock held."""
+        surplus = []
+        while self._idle and len(self._idle) + self._busy > self.size:
+            surplus.append(self._idle.pop(0))
+        return surplus
+
+    def run(
+        self,
+        param_file: Path,
+        work_dir: Path,
+        capture: LogCapture,
+        on_line: Optional[Callable[[str], None]] = None,
+        cpus: Optional[List[int]] = None,
+    ) -> Dict[str, float]:
+        """
+        Run a CONCEPT job on a warm interpreter.
+
+        Returns:
+            Timing report: interpreter warm-up cost, whether a warm
+            interpreter was reused, dispatch latency, per-job and cold
+            startup, and job wall time
+        """
+        interpreter, reused = self._acquire()
+        try:
+            timings = interpreter.run(param_file, work_dir, capture, on_line, cpus)
+        finally:
+            self._release(interpreter)
+        return {
+            "warmup_seconds": 0.0 if reused else interpreter.warmup_seconds,
+            "reused": reused,
+            **timings,
+        }
+
+    @contextmanager
+    def reserve(self, size: int) -> Iterator[None]:
+        """
+        Allow at least ``size`` jobs to run concurrently while in the block.
+
+        The pool shrinks back to its configured size afterwards, so the
+        interpreters started for a packed batch do not stay idle.
+        """
+        with self._lock:
+            self._reservations.append(size)
+            self.size = max([self.base_size, *self._reservations])
+            self._lock.notify_all()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reservations.remove(size)
+                self.size = max([self.base_size, *self._reservations])
+                surplus = self._trim()
+            for extra in surplus:
+                extra.kill()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for interpreter in self._idle:
+                interpreter.kill()
+            self._idle = []
+
+
+_pool: Optional[ConceptWarmPool] = None
+
+
+def get_warm_pool() -> ConceptWarmPool:
+    """Return this process's warm CONCEPT pool."""
+    global _pool
+    if _pool is None:
+        _pool = ConceptWarmPool(settings.concept_warm_pool_size)
+        atexit.register(_pool.shutdown)
+    return _pool
+
+
+def _source_dir() -> Path:
+    """Return CONCEPT's source directory."""
+    return Path(settings.concept_main_path).resolve().parent
+
+
+def _import_source_modules() -> float:
+    """
+    Import CONCEPT's own modules for the current job.
+
+    Runs in the job's child, after its parameter file is on ``sys.argv``;
+    the warm parent never imports them.
+
+    Returns:
+        Seconds spent importing them
+    """
+    sys.path.insert(0, str(_source_dir()))
+    started = time.perf_counter()
+    for name in settings.concept_source_modules:
+        importlib.import_module(name)
+    return time.perf_counter() - started
+
+
+def _run_job(request: dict) -> dict:
+    """Run one job in a forked child of the warm interpreter."""
+    started = time.time()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        os.close(read_fd)
+        try:
+            fd = os.open(request["output_file"], os.O_WRONLY | os.O_APPEND)
+            os.dup2(fd, 1)
+            os.dup2(fd, 2)
+            if request.get("cpus"):
+                os.sched_setaffinity(0, request["cpus"])
+            os.chdir(request["work_dir"])
+            sys.argv = [
+                settings.concept_main_path,
+                f"--params={request['param_file']}",
+            ]
+            startup_seconds = _import_source_modules()
+            os.write(write_fd, json.dumps(startup_seconds).encode())
+            os.close(write_fd)
+            runpy.run_path(settings.concept_main_path, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    os.close(write_fd)
+    sampler = PeakRssSampler(pid)
+    _, wait_status = os.waitpid(pid, 0)
+    with os.fdopen(read_fd, "rb") as startup:
+        startup_seconds = json.loads(startup.read() or "null")
+    return {
+        "returncode": os.waitstatus_to_exitcode(wait_status),
+        "started": started,
+        "startup_seconds": startup_seconds,
+        "finished": time.time(),
+        "peak_rss_mb": sampler.stop(),
+    }
+
+
+def serve() -> None:
+    """Warm up, then run jobs read as JSON lines from stdin."""
+    # Keep the control channel private; stray prints go to stderr
+    control = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+
+    started = time.perf_counter()
+    for module in settings.concept_preload_modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            # Not installed here; the job imports it itself if it needs it
+            print(f"Could not preload {module}: {e}", file=sys.stderr)
+    warmup_seconds = time.perf_counter() - started
+
+    def send(message: dict) -> None:
+        control.write(json.dumps(message) + "\n")
+        control.flush()
+
+    send({"ready": True, "warmup_seconds": warmup_seconds})
+    # Exits when the owning worker closes stdin (or dies)
+    for line in sys.stdin:
+        send(_run_job(json.loads(line)))
+
+
+if __name__ == "__main__":
+    serve()
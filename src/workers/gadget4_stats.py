@@ -0,0 +1,184 @@
+"""Incremental ingestion of Gadget4's per-step performance logs.
+
+Gadget4 appends to three files in its output directory every step:
+
+- ``cpu.txt``: a block per step with wall time per code section
+  (``total``, ``treegrav``, ``pm_grav``, ``domain``, ``i/o``, ...)
+- ``timings.txt``: gravity statistics, including the work-load balance
+- ``balance.txt``: one line per step with the number of active particles
+
+The files are followed from the last read offset, merged into one record
+per step and written to ``simulation_steps`` in batches.
+"""
+
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, insert
+
+from common.config import settings
+from common.database import session_scope
+from common.models import SimulationStep
+
+logger = logging.getLogger(__name__)
+
+CPU_STEP_RE = re.compile(r"^Step\s+(\d+),\s+Time:\s+([0-9.eE+-]+)")
+CPU_ENTRY_RE = re.compile(r"^\s*(\S+)\s+([0-9.]+)\s+[0-9.]+%")
+TIMINGS_STEP_RE = re.compile(r"^Step\(\*\):\s+(\d+)")
+TIMINGS_BALANCE_RE = re.compile(r"work-load balance:\s+([0-9.eE+-]+)")
+BALANCE_RE = re.compile(r"^Step=\s*(\d+)\s+sec=\s*[0-9.eE+-]+\s+Nsync-grv=\s*(\d+)")
+
+# cpu.txt section names mapped to step record columns
+CPU_SECTIONS = {
+    "total": "total_seconds",
+    "treegrav": "tree_seconds",
+    "pm_grav": "pm_seconds",
+    "domain": "domain_seconds",
+    "i/o": "io_seconds",
+}
+
+
+class FileFollower:
+    """Read the complete lines appended to a file since the last read."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offset = 0
+
+    def read_lines(self) -> List[str]:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        # Leave a trailing partial line for the next read
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        return data[:end].decode("utf-8", errors="replace").splitlines()
+
+
+class StepStatsIngester:
+    """Follow a Gadget4 output directory and store per-step records."""
+
+    def __init__(self, job_id: str, output_dir: Path):
+        self.job_id = job_id
+        self.cpu = FileFollower(output_dir / "cpu.txt")
+        self.timings = FileFollower(output_dir / "timings.txt")
+        self.balance = FileFollower(output_dir / "balance.txt")
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.cpu_step: Optional[int] = None
+        self.timings_step: Optional[int] = None
+        self.stored = 0
+        self.last_poll = 0.0
+
+    def _record(self, step: int) -> Dict[str, Any]:
+        return self.pending.setdefault(step, {"job_id": self.job_id, "step": step})
+
+    def parse(self) -> None:
+        """Read new lines from all three files into pending records."""
+        for line in self.cpu.read_lines():
+            match = CPU_STEP_RE.match(line)
+            if match:
+                self.cpu_step = int(match.group(1))
+                self._record(self.cpu_step)["time"] = float(match.group(2))
+                continue
+            match = CPU_ENTRY_RE.match(line)
+            if match and self.cpu_step is not None:
+                column = CPU_SECTIONS.get(match.group(1))
+                record = self._record(self.cpu_step)
+                # Nested sections may repeat a name; keep the top-level one
+                if column and column not in record:
+                    record[column] = float(match.group(2))
+
+        for line in self.timings.read_lines():
+            match = TIMINGS_STEP_RE.match(line)
+            if match:
+                self.timings_step = int(match.group(1))
+                continue
+            match = TIMINGS_BALANCE_RE.search(line)
+            if match and self.timings_step is not None:
+                record = self._record(self.timings_step)
+                # Several gravity calculations per step: keep the worst
+                record["imbalance"] = max(
+                    record.get("imbalance", 0.0), float(match.group(1))
+                )
+
+        for line in self.balance.read_lines():
+            match = BALANCE_RE.match(line)
+            if match:
+                self._record(int(match.group(1)))["active_particles"] = int(
+                    match.group(2)
+                )
+
+    def take_complete(self, final: bool = False) -> List[Dict[str, Any]]:
+        """
+        Remove and return the records that will not change any more.
+
+        A step is complete once cpu.txt has moved on to a later step, since
+        all three files are written by the end of a step.
+        """
+        if final:
+            steps = sorted(self.pending)
+        elif self.cpu_step is None:
+            return []
+        else:
+            steps = sorted(s for s in self.pending if s < self.cpu_step)
+        return [self.pending.pop(step) for step in steps]
+
+    def store(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insert records in batches of ``gadget4_stats_batch_size``.
+
+        Records not stored because of an error are queued again for the next
+        poll before the error is raised.
+        """
+        batch_size = settings.gadget4_stats_batch_size
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            try:
+                with session_scope() as db:
+                    db.execute(insert(SimulationStep), batch)
+            except Exception:
+                self.requeue(rows[start:])
+                raise
+            self.stored += len(batch)
+
+    def requeue(self, rows: List[Dict[str, Any]]) -> None:
+        """Return records to pending, keeping anything parsed since."""
+        for row in rows:
+            self.pending[row["step"]] = {**row, **self.pending.get(row["step"], {})}
+
+    def reset(self) -> None:
+        """Drop records left by an earlier attempt of the job."""
+        with session_scope() as db:
+            db.execute(
+                delete(SimulationStep).where(SimulationStep.job_id == self.job_id)
+            )
+
+    def poll(self, final: bool = False) -> int:
+        """
+        Ingest what the run has written so far.
+
+        Returns:
+            Number of step records stored
+        """
+        self.last_poll = time.monotonic()
+        self.parse()
+        rows = self.take_complete(final)
+        if rows:
+            self.store(rows)
+        return len(rows)
+
+    def maybe_poll(self) -> None:
+        """Poll if ``gadget4_stats_interval`` has passed since the last poll."""
+        if time.monotonic() - self.last_poll < settings.gadget4_stats_interval:
+            return
+        try:
+            self.poll()
+        except Exception as e:
+            # Statistics are best effort; never fail the run over them
+            logger.warning(f"Failed to ingest step stats for job {self.job_id}: {e}")
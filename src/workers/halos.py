@@ -0,0 +1,232 @@
+"""Friends-of-Friends halo catalogs from finished snapshots.
+
+Particles closer than the linking length (a fraction of the mean particle
+separation) are friends, and halos are the connected groups of friends.
+Neighbor pairs are found with periodic KD-trees for one chunk of
+``fof_chunk_particles`` particles at a time and merged into a vectorized
+union-find forest, so memory stays bounded by the chunk's pairs.
+Per-halo sums are then accumulated with ``np.bincount`` while the
+velocities are streamed from the snapshot.
+
+Memory is about 100 bytes per particle (positions, the KD-tree and a few
+index arrays) plus the pairs of one chunk, so 10M particles need roughly
+1-2 GB.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import h5py
+import numpy as np
+from scipy.spatial import cKDTree
+
+from common.config import settings
+from common.spatial import read_chunks, find_snapshots
+
+logger = logging.getLogger(__name__)
+
+FOF_SUFFIX = ".fof.hdf5"
+READ_CHUNK_ROWS = 1024 * 1024
+
+
+def _find(parent: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """Return the roots of ``nodes``, compressing their paths."""
+    roots = parent[nodes]
+    while True:
+        grand = parent[roots]
+        if np.array_equal(grand, roots):
+            break
+        roots = grand
+    parent[nodes] = roots
+    return roots
+
+
+def _union(parent: np.ndarray, a: np.ndarray, b: np.ndarray) -> None:
+    """
+    Merge the trees of each pair ``(a[i], b[i])``.
+
+    Roots always point to a smaller index, so no cycles form. When several
+    pairs hook the same root in one pass only one write wins; the others
+    are retried until every pair shares a root.
+    """
+    while a.size:
+        root_a = _find(parent, a)
+        root_b = _find(parent, b)
+        differ = root_a != root_b
+        low = np.minimum(root_a[differ], root_b[differ])
+        high = np.maximum(root_a[differ], root_b[differ])
+        parent[high] = low
+        a, b = low, high
+
+
+def fof_groups(
+    positions: np.ndarray,
+    box_size: float,
+    linking_length: float,
+    chunk: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Label particles by Friends-of-Friends group in a periodic box.
+
+    Args:
+        positions: Particle positions, shape (N, 3), within [0, box_size)
+        box_size: Side length of the periodic box
+        linking_length: Largest distance between friends
+        chunk: Particles whose pairs are found at once
+
+    Returns:
+        For each particle, the smallest particle index of its group
+    """
+    chunk = chunk or settings.fof_chunk_particles
+    n = len(positions)
+    parent = np.arange(n)
+    tree = cKDTree(positions, boxsize=box_size)
+    for start in range(0, n, chunk):
+        sub = cKDTree(positions[start : start + chunk], boxsize=box_size)
+        pairs = sub.sparse_distance_matrix(tree, linking_length, output_type="ndarray")
+        i = pairs["i"] + start
+        j = pairs["j"]
+        keep = i < j  # Each pair once, and no self pairs
+        _union(parent, i[keep], j[keep])
+    return _find(parent, np.arange(n))
+
+
+def _bincount3(labels: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Sum 3-vectors per label."""
+    return np.stack(
+        [np.bincount(labels, weights=values[:, k], minlength=size) for k in range(3)],
+        axis=1,
+    )
+
+
+def find_halos(
+    files: List[Path],
+    part_type: int = 1,
+    linking_length: Optional[float] = None,
+    min_members: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Build the FoF halo catalog of a snapshot.
+
+    Args:
+        files: HDF5 files of one snapshot
+        part_type: Particle type to group
+        linking_length: In units of the mean particle separation
+        min_members: Smallest group kept
+
+    Returns:
+        Catalog columns: member count, mass, periodic center of mass, mean
+        velocity and 1D velocity dispersion per halo, largest first
+    """
+    group = f"PartType{part_type}"
+    linking_length = linking_length or settings.fof_linking_length
+    min_members = min_members or settings.fof_min_members
+    with h5py.File(files[0], "r") as f:
+        box_size = float(f["Header"].attrs["BoxSize"])
+        mass_table = f["Header"].attrs.get("MassTable")
+    particle_mass = float(mass_table[part_type]) if mass_table is not None else 0.0
+
+    positions = np.concatenate(
+        [
+            np.asarray(chunk, dtype=np.float64)
+            for chunk in read_chunks(files, group, "Coordinates", READ_CHUNK_ROWS)
+        ]
+    )
+    np.mod(positions, box_size, out=positions)
+    positions[positions >= box_size] = 0.0  # Rounding of tiny negatives
+    n = len(positions)
+    link = linking_length * box_size / np.cbrt(n)
+    logger.info(f"Running FoF on {n} particles, linking length {link:.4g}")
+
+    roots = fof_groups(positions, box_size, link)
+    counts = np.bincount(roots, minlength=n)
+    halo_roots = np.flatnonzero(counts >= min_members)
+    halo_of = np.full(n, -1, dtype=np.int64)
+    halo_of[halo_roots] = np.arange(len(halo_roots))
+    members = halo_of[roots]
+    del roots
+    in_halo = members >= 0
+    size = len(halo_roots)
+    member_count = counts[halo_roots]
+    del counts
+
+    # Center of mass relative to a member, using minimum-image offsets
+    reference = positions[halo_roots]
+    idx = members[in_halo]
+    delta = positions[in_halo] - reference[idx]
+    delta -= box_size * np.round(delta / box_size)
+    center = reference + _bincount3(idx, delta, size) / member_count[:, None]
+    np.mod(center, box_size, out=center)
+    del delta, positions
+
+    # Stream velocities (and masses, if not in the mass table)
+    velocity_sum = np.zeros((size, 3))
+    velocity_sq = np.zeros(size)
+    offset = 0
+    for velocities in read_chunks(files, group, "Velocities", READ_CHUNK_ROWS):
+        rows = slice(offset, offset + len(velocities))
+        offset += len(velocities)
+        mask = in_halo[rows]
+        labels = members[rows][mask]
+        v = np.asarray(velocities[mask], dtype=np.float64)
+        velocity_sum += _bincount3(labels, v, size)
+        velocity_sq += np.bincount(labels, weights=np.sum(v**2, axis=1), minlength=size)
+    if particle_mass > 0:
+        mass = member_count * particle_mass
+    else:
+        mass = np.zeros(size)
+        offset = 0
+        for masses in read_chunks(files, group, "Masses", READ_CHUNK_ROWS):
+            rows = slice(offset, offset + len(masses))
+            offset += len(masses)
+            mask = in_halo[rows]
+            mass += np.bincount(
+                members[rows][mask], weights=masses[mask], minlength=size
+            )
+
+    mean_velocity = velocity_sum / member_count[:, None]
+    variance = velocity_sq / member_count - np.sum(mean_velocity**2, axis=1)
+    dispersion = np.sqrt(np.maximum(variance, 0.0) / 3.0)
+
+    order = np.argsort(-member_count, kind="stable")
+    return {
+        "GroupLen": member_count[order].astype(np.int64),
+        "GroupMass": mass[order].astype(np.float32),
+        "GroupPos": center[order].astype(np.float32),
+        "GroupVel": mean_velocity[order].astype(np.float32),
+        "GroupVelDisp": dispersion[order].astype(np.float32),
+        "LinkingLength": np.float64(link),
+        "BoxSize": np.float64(box_size),
+        "NumParticles": np.int64(n),
+    }
+
+
+def write_catalog(catalog: Dict[str, np.ndarray], path: Path) -> None:
+    """Write a catalog as compressed columns; scalars become attributes."""
+    with h5py.File(path, "w") as f:
+        group = f.create_group("Group")
+        for name, value in catalog.items():
+            if np.ndim(value) == 0:
+                f.attrs[name] = value
+            elif len(value):
+                group.create_dataset(name, data=value, compression="gzip", shuffle=True)
+            else:
+                group.create_dataset(name, data=value)
+
+
+def build_catalogs(output_dir: Path) -> List[Path]:
+    """
+    Build the halo catalog of every HDF5 snapshot in an output directory.
+
+    Returns:
+        Paths of the catalog files written
+    """
+    written = []
+    for name, files in find_snapshots(output_dir).items():
+        catalog = find_halos(files)
+        output = output_dir / f"{name}{FOF_SUFFIX}"
+        write_catalog(catalog, output)
+        logger.info(f"Found {len(catalog['GroupLen'])} halos in {name}")
+        written.append(output)
+    return written
@@ -0,0 +1,72 @@
+"""Bin-packing of small simulations into shared worker invocations."""
+
+from dataclasses import dataclass
+from typing import List, Sequence
+
+
+@dataclass
+class PackItem:
+    """A small job with its estimated resource needs."""
+
+    job_id: str
+    cores: int
+    memory_mb: float
+
+
+def pack_jobs(
+    items: Sequence[PackItem], cores: int, memory_mb: float
+) -> List[List[str]]:
+    """
+    Pack jobs into bins of a worker's cores and memory.
+
+    Uses first-fit decreasing on memory, the scarcer resource for small
+    jobs, while checking both dimensions. A job too large for an empty bin
+    gets a bin to itself.
+
+    Returns:
+        Job IDs per bin
+    """
+    bins: List[List[PackItem]] = []
+    free: List[List[float]] = []  # [cores, memory_mb] left per bin
+
+    for item in sorted(items, key=lambda i: (i.memory_mb, i.cores), reverse=True):
+        for contents, room in zip(bins, free):
+            if item.cores <= room[0] and item.memory_mb <= room[1]:
+                contents.append(item)
+                room[0] -= item.cores
+                room[1] -= item.memory_mb
+                break
+        else:
+            bins.append([item])
+            free.append([cores - item.cores, memory_mb - item.memory_mb])
+
+    return [[item.job_id for item in contents] for contents in bins]
+
+
+def assign_cpus(job_cores: Sequence[int], cpus: Sequence[int]) -> List[List[int]]:
+    """
+    Give each job a disjoint slice of the available CPUs.
+
+    Slices wrap around when the jobs ask for more CPUs than are available,
+    so every job still gets the number it asked for.
+    """
+    cpus = sorted(cpus)
+    assignments = []
+    offset = 0
+    for cores in job_cores:
+        assignments.append([cpus[(offset + i) % len(cpus)] for i in range(cores)])
+        offset += cores
+    return assignments
+
+
+def share_memory(job_memory_mb: Sequence[float], memory_mb: float) -> List[float]:
+    """
+    Split a worker's memory between packed jobs in proportion to their needs.
+
+    Jobs the packer fitted into one bin each get at least their estimate; a
+    job too large for an empty bin gets all of it.
+    """
+    total = sum(job_memory_mb)
+    if total <= 0:
+        return [memory_mb / len(job_memory_mb)] * len(job_memory_mb)
+    return [memory_mb * need / total for need in job_memory_mb]
@@ -0,0 +1,237 @@
+"""Execution of simulator processes with streamed output."""
+
+import logging
+import os
+import re
+import signal
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from common.config import settings
+from common.logs import LogCapture
+
+logger = logging.getLogger(__name__)
+
+# Seconds between peak RSS samples of a running simulator
+RSS_SAMPLE_INTERVAL = 1.0
+
+# Gadget4 prints one of these per global timestep
+SYNC_POINT_RE = re.compile(r"Sync-Point\s+\d+,\s+Time:\s+([0-9.eE+-]+)")
+
+
+class SimulationError(RuntimeError):
+    """Raised when a simulator process exits unsuccessfully."""
+
+
+# Process groups of the simulators this worker process is running. Celery
+# only interrupts the main thread, so a packed batch kills its jobs' groups
+# from there when its time limit is reached.
+_process_groups: Set[int] = set()
+_process_groups_lock = threading.Lock()
+
+
+def register_process_group(pgid: int) -> None:
+    """Track a running simulator process group."""
+    with _process_groups_lock:
+        _process_groups.add(pgid)
+
+
+def unregister_process_group(pgid: int) -> None:
+    with _process_groups_lock:
+        _process_groups.discard(pgid)
+
+
+def kill_process_groups() -> int:
+    """
+    Kill every tracked simulator process group.
+
+    Returns:
+        Number of process groups signalled
+    """
+    with _process_groups_lock:
+        pgids = list(_process_groups)
+        _process_groups.clear()
+    for pgid in pgids:
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    return len(pgids)
+
+
+class PeakRssSampler:
+    """
+    Track the peak RSS of a process tree from ``/proc``.
+
+    ``VmHWM`` of every process in the tree is sampled every
+    ``RSS_SAMPLE_INTERVAL`` seconds and once more on ``stop``, and the peaks
+    of all processes seen are summed. Unlike ``getrusage``, this covers only
+    the job's own processes: a worker process is shared by many jobs, and a
+    forked child inherits its parent's high-water mark across ``exec``.
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peaks: Dict[int, int] = {}  # KB per process
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"rss-{pid}", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.sample()
+
+    def sample(self) -> None:
+        for pid in _process_tree(self.pid):
+            hwm = _vm_hwm_kb(pid)
+            if hwm is not None:
+                self.peaks[pid] = max(self.peaks.get(pid, 0), hwm)
+
+    def stop(self) -> Optional[float]:
+        """
+        Stop sampling, taking a last sample first.
+
+        Returns:
+            Summed peak RSS in MB, or None if nothing could be sampled
+        """
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            self.sample()
+        if not self.peaks:
+            return None
+        return round(sum(self.peaks.values()) / 1024, 1)
+
+
+def _process_tree(root: int) -> List[int]:
+    """Return ``root`` and its live descendants."""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields follow its ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+def _vm_hwm_kb(pid: int) -> Optional[int]:
+    """Return the peak RSS of a live process in KB, if readable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def gadget4_command(
+    param_file: Path, ranks: int = 1, pinned: bool = False
+) -> List[str]:
+    """
+    Build the command line for a Gadget4 run.
+
+    Set ``pinned`` when the caller restricts the run to a CPU set, so MPI
+    keeps the inherited affinity instead of binding ranks itself.
+    """
+    command = [settings.gadget4_executable, str(param_file)]
+    if ranks > 1:
+        launcher = [settings.mpi_launcher, "-np", str(ranks)]
+        if pinned:
+            launcher += ["--bind-to", "none"]
+        command = launcher + command
+    return command
+
+
+def concept_command(param_file: Path, ranks: int = 1) -> List[str]:
+    """Build the command line for a CONCEPT run in a fresh process."""
+    return [settings.concept_executable, "-n", str(ranks), "-p", str(param_file)]
+
+
+def parse_sync_point(line: str) -> Optional[float]:
+    """Return the simulation time reported by a Sync-Point line, if any."""
+    match = SYNC_POINT_RE.search(line)
+    return float(match.group(1)) if match else None
+
+
+def run_process(
+    command: List[str],
+    cwd: Path,
+    capture: LogCapture,
+    on_line: Optional[Callable[[str], None]] = None,
+    cpus: Optional[List[int]] = None,
+) -> Optional[float]:
+    """
+    Run a simulator process, streaming its combined stdout/stderr.
+
+    Every line goes to ``capture``; ``on_line`` may inspect it (e.g. for
+    progress). ``cpus`` pins the process to a CPU set. The process runs in
+    its own process group, so MPI ranks are killed with it, either when the
+    caller is interrupted or by ``kill_process_groups``.
+
+    Returns:
+        Peak RSS in MB of the process and its descendants, such as MPI
+        ranks under the launcher (see ``PeakRssSampler``)
+
+    Raises:
+        SimulationError: If the process exits with a non-zero code
+    """
+    if cpus:
+        # Not preexec_fn: it is unsafe when threads are running, and packed
+        # jobs are started from a thread pool
+        command = ["taskset", "-c", ",".join(map(str, cpus)), *command]
+    logger.info(f"Running {' '.join(command)} in {cwd}")
+    process = subprocess.Popen(
+        command,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        bufsize=1,
+        start_new_session=True,
+    )
+    register_process_group(process.pid)
+    sampler = PeakRssSampler(process.pid)
+    try:
+        for line in process.stdout:
+            capture.write(line)
+            if on_line:
+                on_line(line)
+        peak_rss_mb = sampler.stop()
+        returncode = process.wait()
+    except BaseException:
+        sampler.stop()
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+        raise
+    finally:
+        unregister_process_group(process.pid)
+        process.stdout.close()
+
+    if returncode != 0:
+        tail = "\n".join(list(capture.tail)[-5:])
+        raise SimulationError(f"{command[0]} exited with code {returncode}:\n{tail}")
+    return peak_rss_mb
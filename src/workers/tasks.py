@@ -1,17 +1,87 @@
-"""Celery tasks for Gadget4 simulations."""
+"""Celery tasks for Gadget4 and CONCEPT simulations."""
 
 import logging
-from datetime import datetime
+import os
+import shutil
+import time
+import traceback
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 
 from celery import Task
+from celery.exceptions import SoftTimeLimitExceeded
 
 from workers.worker import app
-from common.database import SessionLocal
-from common.models import SimulationJob, JobStatus
+from common.config import settings
+from common.database import session_scope
+from common.logs import INDEX_SUFFIX, LOG_FILENAME, LogCapture, log_object_key
+from common.models import SimulationJob, JobStatus, SimulatorType
+from common.parameters import (
+    build_concept_parameters,
+    build_gadget4_parameters,
+    format_concept_parameter_file,
+    format_parameter_file,
+)
+from common.preview import build_previews
+from common.redis_client import redis_client
+from common.resources import MEMORY_HEADROOM, estimate_memory, get_worker_class
+from common.spatial import SNAPSHOT_RE, index_snapshots
+from common.storage import get_storage, upload_directory
+from common.tuning import similar_runs, tune_gadget4
+from workers.concept_pool import get_warm_pool
+from workers.gadget4_stats import StepStatsIngester
+from workers.halos import build_catalogs
+from workers.packer import PackItem, assign_cpus, pack_jobs, share_memory
+from workers.timing import PhaseTimer, profiled
+from workers.runner import (
+    concept_command,
+    gadget4_command,
+    kill_process_groups,
+    parse_sync_point,
+    run_process,
+)
 
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between progress writes to the database
+PROGRESS_INTERVAL = 5.0
+
+PROFILE_FILENAME = "profile.pstats"
+
+# Seconds past the hard time limit after which a running job is known dead
+STALE_RUNNING_GRACE = 300
+
+
+def load_job(job_id: str) -> SimulationJob:
+    """Load a detached snapshot of a job without keeping a session open."""
+    with session_scope() as db:
+        job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
+        if not job:
+            raise ValueError(f"Job {job_id} not found")
+        db.expunge(job)
+    return job
+
+
+def update_job(job_id: str, **fields: Any) -> None:
+    """Apply a job state transition in its own short-lived session."""
+    with session_scope() as db:
+        db.query(SimulationJob).filter(SimulationJob.id == job_id).update(fields)
+
+
+def mark_job_failed(job_id: str, exc: BaseException, traceback_text: str) -> None:
+    """Record a job failure in the database."""
+    update_job(
+        job_id,
+        status=JobStatus.FAILED,
+        error_message=str(exc),
+        error_traceback=traceback_text,
+        completed_at=datetime.utcnow(),
+    )
+
 
 class SimulationTask(Task):
     """Base task for simulations with automatic state updates."""
@@ -20,106 +90,680 @@ class SimulationTask(Task):
         """Handle task failure."""
         job_id = args[0] if args else None
         if job_id:
-            db = SessionLocal()
-            try:
-                job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
-                if job:
-                    job.status = JobStatus.FAILED
-                    job.error_message = str(exc)
-                    job.error_traceback = str(einfo)
-                    job.completed_at = datetime.utcnow()
-                    db.commit()
-            finally:
-                db.close()
+            mark_job_failed(job_id, exc, str(einfo))
+
+
+class PackedSimulationTask(Task):
+    """Base task for packed batches; a failed batch fails its unfinished jobs."""
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        """Mark every job of the batch that did not finish as failed."""
+        fail_unfinished_jobs(task_id, args[0] if args else [], exc, str(einfo))
+
+
+def fail_unfinished_jobs(
+    batch_id: str, job_ids: List[str], exc: BaseException, traceback_text: str
+) -> None:
+    """Mark the jobs of a batch that are still pending or running as failed."""
+    with session_scope() as db:
+        db.query(SimulationJob).filter(
+            SimulationJob.id.in_(job_ids),
+            SimulationJob.celery_task_id == batch_id,
+            SimulationJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+        ).update(
+            {
+                "status": JobStatus.FAILED,
+                "error_message": f"Packed batch failed: {exc}",
+                "error_traceback": traceback_text,
+                "completed_at": datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
 
 
 @app.task(base=SimulationTask, bind=True)
 def run_simulation(self, job_id: str):
     """
-    Run a Gadget4 N-body simulation.
+    Run a Gadget4 or CONCEPT N-body simulation.
 
     Args:
         job_id: UUID of the simulation job
     """
-    db = SessionLocal()
+    return execute_job(job_id, task=self)
+
+
+@app.task(base=PackedSimulationTask, bind=True)
+def run_packed_simulations(self, job_ids: List[str]):
+    """
+    Run a bin-packed batch of small simulations side by side.
+
+    Each job is pinned to its own slice of this worker's CPUs and reports
+    its outcome to its own ``SimulationJob``; one failing job does not
+    affect the others. Jobs the packer has since reclaimed from this batch
+    are skipped. At the soft time limit every job's simulator process group
+    is killed and the unfinished jobs are failed.
+
+    Args:
+        job_ids: UUIDs of the simulation jobs in the batch
+    """
+    job_ids = start_batch(self.request.id, job_ids)
+    if not job_ids:
+        return []
+    cpu_sets = assign_cpus(
+        [settings.pack_job_cores] * len(job_ids), os.sched_getaffinity(0)
+    )
+    with session_scope() as db:
+        jobs = {
+            job.id: job
+            for job in db.query(SimulationJob).filter(SimulationJob.id.in_(job_ids))
+        }
+        warm_jobs = sum(
+            job.simulator_type == SimulatorType.CONCEPT
+            and job.num_particles <= settings.concept_warm_max_particles
+            for job in jobs.values()
+        )
+        # Each job's tuning gets its share of the memory the packer fitted it in
+        needs_mb = [
+            estimate_memory(
+                jobs[job_id].simulator_type,
+                jobs[job_id].num_particles,
+                settings.pack_job_cores,
+            ).total_mb
+            for job_id in job_ids
+        ]
+        worker_class = get_worker_class(jobs[job_ids[0]].queue)
+    memory_slices = (
+        share_memory(needs_mb, worker_class.memory_gb * 1024 * MEMORY_HEADROOM)
+        if worker_class
+        else [None] * len(job_ids)
+    )
+
+    def execute_packed(
+        job_id: str, cpus: List[int], memory_mb: Optional[float]
+    ) -> Dict[str, Any]:
+        try:
+            return execute_job(job_id, cpus=cpus, memory_mb=memory_mb)
+        except Exception as e:
+            mark_job_failed(job_id, e, traceback.format_exc())
+            return {"job_id": job_id, "status": "failed", "error": str(e)}
+
+    executor = ThreadPoolExecutor(max_workers=len(job_ids))
+    # Only CONCEPT jobs use warm interpreters; the pool shrinks back after
+    with get_warm_pool().reserve(warm_jobs):
+        try:
+            futures = [
+                executor.submit(execute_packed, job_id, cpus, memory_mb)
+                for job_id, cpus, memory_mb in zip(job_ids, cpu_sets, memory_slices)
+            ]
+            results = [future.result() for future in futures]
+        except SoftTimeLimitExceeded as e:
+            # Celery interrupts only this thread; the job threads stay blocked
+            # on their simulators until those are killed
+            killed = kill_process_groups()
+            logger.error(
+                f"Packed batch {self.request.id} hit its time limit; "
+                f"killed {killed} simulator process groups"
+            )
+            fail_unfinished_jobs(self.request.id, job_ids, e, traceback.format_exc())
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(
+        f"Packed batch {self.request.id}: "
+        f"{sum(r['status'] == 'completed' for r in results)}/{len(results)} completed"
+    )
+    return results
+
+
+def start_batch(batch_id: str, job_ids: List[str]) -> List[str]:
+    """
+    Move the jobs still claimed by a batch to running.
+
+    Returns:
+        IDs of the jobs the batch should run
+    """
+    started = []
+    with session_scope() as db:
+        for job_id in job_ids:
+            claimed = (
+                db.query(SimulationJob)
+                .filter(
+                    SimulationJob.id == job_id,
+                    SimulationJob.celery_task_id == batch_id,
+                    SimulationJob.status == JobStatus.PENDING,
+                )
+                .update(
+                    {
+                        "status": JobStatus.RUNNING,
+                        "started_at": datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if claimed:
+                started.append(job_id)
+            else:
+                logger.warning(f"Job {job_id} is no longer claimed by {batch_id}")
+    return started
+
+
+def reclaim_stale_jobs(db) -> None:
+    """
+    Release stale packer claims and fail jobs whose worker is gone.
+
+    Pending jobs claimed more than ``pack_claim_timeout`` seconds ago were
+    never started (e.g. their batch was lost) and are packed again. Running
+    jobs older than the hard time limit cannot still be running.
+    """
+    now = datetime.utcnow()
+    released = (
+        db.query(SimulationJob)
+        .filter(
+            SimulationJob.status == JobStatus.PENDING,
+            SimulationJob.celery_task_id.isnot(None),
+            SimulationJob.claimed_at
+            < now - timedelta(seconds=settings.pack_claim_timeout),
+        )
+        .update({"celery_task_id": None, "claimed_at": None}, synchronize_session=False)
+    )
+    limit = settings.max_simulation_time + STALE_RUNNING_GRACE
+    failed = (
+        db.query(SimulationJob)
+        .filter(
+            SimulationJob.status == JobStatus.RUNNING,
+            SimulationJob.started_at < now - timedelta(seconds=limit),
+        )
+        .update(
+            {
+                "status": JobStatus.FAILED,
+                "error_message": "Worker lost or hard time limit exceeded",
+                "completed_at": now,
+            },
+            synchronize_session=False,
+        )
+    )
+    if released or failed:
+        logger.warning(f"Released {released} stale claims, failed {failed} lost jobs")
+
+
+@app.task
+def pack_small_jobs():
+    """
+    Collect pending small jobs and dispatch them in bin-packed batches.
+
+    Jobs up to ``pack_max_particles`` that have not been dispatched yet are
+    packed per worker queue by estimated cores and memory, and each bin is
+    sent as one ``run_packed_simulations`` invocation. Rows are claimed with
+    ``SKIP LOCKED`` so concurrent packers never dispatch a job twice. Stale
+    claims are released first (see ``reclaim_stale_jobs``).
+    """
+    with session_scope() as db:
+        reclaim_stale_jobs(db)
+        jobs = (
+            db.query(SimulationJob)
+            .filter(
+                SimulationJob.status == JobStatus.PENDING,
+                SimulationJob.celery_task_id.is_(None),
+                SimulationJob.num_particles <= settings.pack_max_particles,
+            )
+            .order_by(SimulationJob.created_at)
+            .limit(settings.pack_max_jobs)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+        by_queue: Dict[str, List[SimulationJob]] = defaultdict(list)
+        for job in jobs:
+            by_queue[job.queue].append(job)
+
+        batches = []
+        for queue, queue_jobs in by_queue.items():
+            worker_class = get_worker_class(queue)
+            if worker_class is None:
+                logger.warning(f"No worker class for queue {queue}, not packing")
+                continue
+            items = [
+                PackItem(
+                    job_id=job.id,
+                    cores=settings.pack_job_cores,
+                    memory_mb=estimate_memory(
+                        job.simulator_type, job.num_particles, settings.pack_job_cores
+                    ).total_mb,
+                )
+                for job in queue_jobs
+            ]
+            capacity_mb = worker_class.memory_gb * 1024 * MEMORY_HEADROOM
+            claimed_at = datetime.utcnow()
+            for job_ids in pack_jobs(items, worker_class.cores, capacity_mb):
+                batch_id = str(uuid.uuid4())
+                for job in queue_jobs:
+                    if job.id in job_ids:
+                        job.celery_task_id = batch_id
+                        job.claimed_at = claimed_at
+                batches.append((batch_id, queue, job_ids))
+
+    # The jobs are claimed (committed) before dispatch so they are never sent twice
+
+    dispatched = []
+    for batch_id, queue, job_ids in batches:
+        try:
+            run_packed_simulations.apply_async(
+                args=[job_ids], queue=queue, task_id=batch_id
+            )
+        except Exception as e:
+            logger.error(f"Failed to dispatch packed batch {batch_id}: {e}")
+            release_claim(batch_id)
+            continue
+        dispatched.append(batch_id)
+        logger.info(f"Dispatched {len(job_ids)} packed jobs to {queue}: {batch_id}")
+
+    return dispatched
+
+
+def release_claim(batch_id: str) -> None:
+    """Return the pending jobs of an undispatched batch to the packer."""
+    with session_scope() as db:
+        db.query(SimulationJob).filter(
+            SimulationJob.celery_task_id == batch_id,
+            SimulationJob.status == JobStatus.PENDING,
+        ).update(
+            {"celery_task_id": None, "claimed_at": None}, synchronize_session=False
+        )
+
+
+def snapshot_keys(
+    job_id: str, output_files: Optional[List[str]]
+) -> Dict[str, List[str]]:
+    """Group a job's output keys by the snapshot they belong to."""
+    prefix = f"{job_id}/output/"
+    keys: Dict[str, List[str]] = defaultdict(list)
+    for key in output_files or []:
+        match = SNAPSHOT_RE.match(key.rsplit("/", 1)[-1])
+        if match and key.startswith(prefix):
+            keys[match.group(1)].append(key)
+    return keys
+
+
+def build_snapshot_outputs(
+    job_id: str, build: Callable[[Path], List[Path]], key_prefix: str
+) -> List[str]:
+    """
+    Run a builder of derived outputs over each snapshot of a finished job.
+
+    Snapshots are downloaded one at a time; the files the builder writes,
+    with their ``.idx`` sidecars, are uploaded to ``<job_id>/<key_prefix>/``
+    and added to the job's output files.
+
+    Returns:
+        Storage keys uploaded
+    """
+    job = load_job(job_id)
+    prefix = f"{job_id}/output/"
+    storage = get_storage()
+    work_dir = Path(f"/tmp/postprocess/{job_id}-{build.__name__}")
+    uploaded = []
     try:
-        # Get job from database
-        job = db.query(SimulationJob).filter(SimulationJob.id == job_id).first()
-        if not job:
-            raise ValueError(f"Job {job_id} not found")
+        for name, keys in sorted(snapshot_keys(job_id, job.output_files).items()):
+            snapshot_dir = work_dir / name
+            for key in keys:
+                local_path = snapshot_dir / key[len(prefix) :]
+                local_path.parent.mkdir(parents=True, exist_ok=True)
+                storage.download_file(key, local_path)
+
+            for path in build(snapshot_dir):
+                for local_path in (path, Path(str(path) + INDEX_SUFFIX)):
+                    if local_path.is_file():
+                        key = f"{job_id}/{key_prefix}/{local_path.name}"
+                        storage.upload_file(local_path, key)
+                        uploaded.append(key)
+            shutil.rmtree(snapshot_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Re-read the file list: it may have changed while the outputs were built
+    output_files = [
+        key for key in load_job(job_id).output_files or [] if key not in uploaded
+    ]
+    update_job(job_id, output_files=output_files + uploaded)
+    return uploaded
+
+
+@app.task
+def build_spatial_indexes(job_id: str) -> Dict[str, Any]:
+    """Build the region-query index of each snapshot of a job."""
+    indexes = build_snapshot_outputs(job_id, index_snapshots, "output")
+    return {"job_id": job_id, "indexes": indexes}
+
+
+@app.task
+def build_snapshot_previews(job_id: str) -> Dict[str, Any]:
+    """Build the preview tile pyramid of each snapshot of a job."""
+    previews = build_snapshot_outputs(job_id, build_previews, "output")
+    return {"job_id": job_id, "previews": previews}
+
+
+@app.task
+def build_halo_catalogs(job_id: str) -> Dict[str, Any]:
+    """Build a Friends-of-Friends halo catalog for each snapshot of a job."""
+    catalogs = build_snapshot_outputs(job_id, build_catalogs, "halos")
+    return {"job_id": job_id, "catalogs": catalogs}
+
+
+def queue_postprocessing(job_id: str, output_files: List[str]) -> None:
+    """Queue the enabled post-processing tasks of a job that wrote snapshots."""
+    if not snapshot_keys(job_id, output_files):
+        return
+    postprocessing = [
+        (settings.spatial_index_after_run, build_spatial_indexes),
+        (settings.previews_after_run, build_snapshot_previews),
+        (settings.halo_catalogs_after_run, build_halo_catalogs),
+    ]
+    for enabled, postprocess in postprocessing:
+        if not enabled:
+            continue
+        try:
+            postprocess.apply_async(args=[job_id])
+        except Exception as e:
+            logger.error(f"Failed to queue {postprocess.name} for job {job_id}: {e}")
+
+
+def execute_job(
+    job_id: str,
+    task: Optional[Task] = None,
+    cpus: Optional[List[int]] = None,
+    memory_mb: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Run one simulation job end to end and record its outcome.
+
+    Args:
+        job_id: UUID of the simulation job
+        task: Celery task to report progress through, if any
+        cpus: CPU set to pin the simulator to; its size sets the rank count
+        memory_mb: Memory given to the run, if it shares the worker; the
+            worker's usable memory otherwise
+    """
+    timer = PhaseTimer()
+    work_dir = Path(f"/tmp/gadget4/{job_id}")
+    try:
+        # Snapshot the job; no session is held while the simulation runs
+        job = load_job(job_id)
 
         logger.info(f"Starting simulation job {job_id}: {job.name}")
 
         # Update job status to running
-        job.status = JobStatus.RUNNING
-        job.started_at = datetime.utcnow()
-        db.commit()
+        started_at = datetime.utcnow()
+        update_job(job_id, status=JobStatus.RUNNING, started_at=started_at)
+        timer.record("queue_wait", seconds_between(job.created_at, started_at))
 
         # Create working directory
-        work_dir = Path(f"/tmp/gadget4/{job_id}")
         work_dir.mkdir(parents=True, exist_ok=True)
 
-        # Generate Gadget4 parameter file
-        param_file = work_dir / "params.txt"
-        generate_parameter_file(param_file, job)
-
-        # TODO: Run Gadget4 simulation
-        # This is a placeholder - actual Gadget4 execution will be implemented
-        # result = subprocess.run(
-        #     ["gadget4", str(param_file)],
-        #     cwd=work_dir,
-        #     capture_output=True,
-        #     text=True,
-        #     check=True,
-        # )
-
-        # Simulate progress updates
-        for progress in [25, 50, 75, 100]:
-            job.progress = float(progress)
-            db.commit()
-            self.update_state(state="PROGRESS", meta={"progress": progress})
-
-        # TODO: Upload results to cloud storage
-        # result_path = upload_results(work_dir, job_id)
-        result_path = f"gs://gadget4-results/{job_id}/"  # Placeholder
+        if cpus:
+            ranks = len(cpus)
+        else:
+            worker_class = get_worker_class(job.queue)
+            ranks = worker_class.cores if worker_class else 1
+
+        with profiled(job.profile, work_dir / PROFILE_FILENAME):
+            with timer.phase("parameter_generation") as phase:
+                param_file = write_parameter_file(job, work_dir, ranks, memory_mb)
+                phase["bytes"] = param_file.stat().st_size
+
+            # Run the simulator, streaming its output into the job log
+            capture = LogCapture(job_id, work_dir / LOG_FILENAME, cache=redis_client)
+            try:
+                with timer.phase("simulation") as phase:
+                    if job.simulator_type == SimulatorType.CONCEPT:
+                        run_report = run_concept(
+                            job, work_dir, param_file, ranks, capture, cpus
+                        )
+                    else:
+                        run_report = run_gadget4(
+                            task, job, work_dir, param_file, ranks, capture, cpus
+                        )
+                    phase["peak_rss_mb"] = run_report["peak_rss_mb"]
+            finally:
+                capture.close()
+                with timer.phase("log_upload") as phase:
+                    log_path = upload_log(capture, job_id)
+                    phase["bytes"] = capture.writer.compressed_size
+                update_job(job_id, log_path=log_path)
+
+            # Upload results to cloud storage
+            with timer.phase("result_upload") as phase:
+                result_path, output_files = upload_directory(
+                    work_dir / "output", f"{job_id}/output"
+                )
+                phase["bytes"] = directory_bytes(work_dir / "output")
 
         # Update job as completed
-        job.status = JobStatus.COMPLETED
-        job.progress = 100.0
-        job.result_path = result_path
-        job.completed_at = datetime.utcnow()
-        db.commit()
+        update_job(
+            job_id,
+            status=JobStatus.COMPLETED,
+            progress=100.0,
+            result_path=result_path,
+            output_files=output_files,
+            completed_at=datetime.utcnow(),
+        )
 
         logger.info(f"Simulation job {job_id} completed successfully")
 
+        queue_postprocessing(job_id, output_files)
+
         return {
             "job_id": job_id,
             "status": "completed",
             "result_path": result_path,
+            "run": run_report,
         }
 
     except Exception as e:
         logger.error(f"Simulation job {job_id} failed: {e}")
         raise
     finally:
-        db.close()
+        record_timings(job_id, timer, work_dir / PROFILE_FILENAME)
 
 
-def generate_parameter_file(param_file: Path, job: SimulationJob):
-    """Generate Gadget4 parameter file from job configuration."""
-    # This is a simplified example - real parameter file will be more complex
-    params = f"""
-BoxSize              {job.box_size}
-ParticleNumber       {job.num_particles}
-OutputDir            ./output
-TimeBetSnapshot      0.1
-TimeMax              1.0
+def seconds_between(start: datetime, end: datetime) -> float:
+    """Return seconds between two timestamps, treating naive ones as UTC."""
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    return max((end - start).total_seconds(), 0.0)
+
+
+def directory_bytes(path: Path) -> int:
+    """Return the total size of the files below a directory."""
+    if not path.is_dir():
+        return 0
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def record_timings(job_id: str, timer: PhaseTimer, profile_file: Path) -> None:
+    """Upload the profile, if one was captured, and store the job's timings."""
+    if profile_file.is_file():
+        try:
+            timer.profile_path = get_storage().upload_file(
+                profile_file, f"{job_id}/{PROFILE_FILENAME}"
+            )
+        except Exception as e:
+            logger.error(f"Failed to upload profile for job {job_id}: {e}")
+    try:
+        update_job(job_id, timings=timer.as_dict())
+    except Exception as e:
+        logger.error(f"Failed to record timings for job {job_id}: {e}")
+
+
+def write_parameter_file(
+    job: SimulationJob, work_dir: Path, ranks: int, memory_mb: Optional[float] = None
+) -> Path:
+    """Write the simulator parameter file for a job and return its path."""
+    if job.simulator_type == SimulatorType.CONCEPT:
+        param_file = work_dir / "params.py"
+        generate_concept_parameter_file(param_file, job)
+    else:
+        param_file = work_dir / "params.txt"
+        tuning = tune_job(job, ranks, memory_mb) if settings.gadget4_auto_tune else None
+        generate_parameter_file(
+            param_file, job, tuning["parameters"] if tuning else None
+        )
+    return param_file
+
+
+def tune_job(
+    job: SimulationJob, ranks: int, memory_mb: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Pick tuned Gadget4 parameters for a run and record them on the job.
+
+    The memory budget is ``memory_mb`` (a packed job's share of the worker),
+    or the worker's usable memory, split over the run's ranks.
+    """
+    if memory_mb is None:
+        worker_class = get_worker_class(job.queue)
+        if worker_class:
+            memory_mb = worker_class.memory_gb * 1024 * MEMORY_HEADROOM
+    memory_per_rank_mb = memory_mb / ranks if memory_mb is not None else None
+    with session_scope() as db:
+        history = similar_runs(db, job.num_particles, job.queue)
+    tuning = tune_gadget4(
+        job.num_particles, ranks, memory_per_rank_mb, history, job.parameters
+    )
+    update_job(job.id, tuned_parameters=tuning)
+    logger.info(f"Tuned parameters for job {job.id}: {tuning['parameters']}")
+    return tuning
+
+
+def run_gadget4(
+    task: Optional[Task],
+    job: SimulationJob,
+    work_dir: Path,
+    param_file: Path,
+    ranks: int,
+    capture: LogCapture,
+    cpus: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Run Gadget4 under MPI, reporting progress from its Sync-Point lines.
+
+    Gadget4's per-step statistics are ingested while the run goes, every
+    ``gadget4_stats_interval`` seconds of output, and once more at the end.
+    """
+    time_max = float((job.parameters or {}).get("TimeMax", 1.0))
+    reported = {"progress": job.progress or 0.0, "at": 0.0}
+    output_dir = build_gadget4_parameters(
+        job.box_size, job.num_particles, job.parameters
+    )["OutputDir"]
+    stats = StepStatsIngester(job.id, work_dir / output_dir)
+    try:
+        stats.reset()
+    except Exception as e:
+        logger.warning(f"Failed to clear step stats for job {job.id}: {e}")
+
+    def on_line(line: str) -> None:
+        report_progress(line)
+        stats.maybe_poll()
+
+    def report_progress(line: str) -> None:
+        sim_time = parse_sync_point(line)
+        if sim_time is None or time_max <= 0:
+            return
+        progress = round(min(sim_time / time_max, 1.0) * 100.0, 1)
+        # Throttle writes: at least 1% and PROGRESS_INTERVAL seconds apart
+        now = time.monotonic()
+        if (
+            progress >= reported["progress"] + 1.0
+            and now - reported["at"] >= PROGRESS_INTERVAL
+        ):
+            reported.update(progress=progress, at=now)
+            update_job(job.id, progress=progress)
+            if task is not None:
+                task.update_state(state="PROGRESS", meta={"progress": progress})
+
+    started = time.perf_counter()
+    try:
+        peak_rss_mb = run_process(
+            gadget4_command(param_file, ranks, pinned=bool(cpus)),
+            work_dir,
+            capture,
+            on_line,
+            cpus,
+        )
+    finally:
+        try:
+            stats.poll(final=True)
+        except Exception as e:
+            logger.warning(f"Failed to ingest step stats for job {job.id}: {e}")
+    return {
+        "mode": "process",
+        "job_seconds": time.perf_counter() - started,
+        "peak_rss_mb": peak_rss_mb,
+        "steps_recorded": stats.stored,
+    }
+
+
+def run_concept(
+    job: SimulationJob,
+    work_dir: Path,
+    param_file: Path,
+    ranks: int,
+    capture: LogCapture,
+    cpus: Optional[List[int]] = None,
+) -> Dict[str, Any]:
     """
+    Run CONCEPT.
+
+    Jobs up to ``concept_warm_max_particles`` run single-rank on a warm
+    interpreter from the pool, skipping CONCEPT's startup cost; larger jobs
+    get a fresh MPI process. Startup overhead and latency are logged and
+    returned either way.
+    """
+    if job.num_particles <= settings.concept_warm_max_particles:
+        timings = get_warm_pool().run(param_file, work_dir, capture, cpus=cpus)
+        report = {"mode": "warm", **timings}
+    else:
+        started = time.perf_counter()
+        peak_rss_mb = run_process(
+            concept_command(param_file, ranks), work_dir, capture, cpus=cpus
+        )
+        report = {
+            "mode": "process",
+            "job_seconds": time.perf_counter() - started,
+            "peak_rss_mb": peak_rss_mb,
+        }
+
+    logger.info(f"CONCEPT job {job.id} run report: {report}")
+    return report
+
+
+def upload_log(capture: LogCapture, job_id: str) -> Optional[str]:
+    """Upload the compressed simulator log and its index."""
+    storage = get_storage()
+    key = log_object_key(job_id)
+    try:
+        storage.upload_file(capture.index_path, key + INDEX_SUFFIX)
+        return storage.upload_file(capture.path, key)
+    except Exception as e:
+        logger.error(f"Failed to upload log for job {job_id}: {e}")
+        return None
+
+
+def generate_parameter_file(
+    param_file: Path, job: SimulationJob, tuned: Optional[Dict[str, Any]] = None
+):
+    """Generate Gadget4 parameter file from job configuration."""
+    params = build_gadget4_parameters(
+        job.box_size, job.num_particles, {**(tuned or {}), **(job.parameters or {})}
+    )
+    param_file.write_text(format_parameter_file(params))
+    logger.info(f"Generated parameter file: {param_file}")
 
-    # Add any additional parameters from job.parameters
-    if job.parameters:
-        for key, value in job.parameters.items():
-            params += f"{key}    {value}\n"
 
-    param_file.write_text(params)
+def generate_concept_parameter_file(param_file: Path, job: SimulationJob):
+    """Generate CONCEPT parameter file from job configuration."""
+    params = build_concept_parameters(job.box_size, job.num_particles, job.parameters)
+    param_file.write_text(format_concept_parameter_file(params))
     logger.info(f"Generated parameter file: {param_file}")
@@ -0,0 +1,82 @@
+"""Per-job phase timing and opt-in profiling of the worker's Python side."""
+
+import cProfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class PhaseTimer:
+    """
+    Record wall time, bytes moved and peak RSS for each phase of a job.
+
+    The worker process is shared by many jobs (and by the threads of a
+    packed batch), so its own high-water mark says nothing about one job.
+    ``peak_rss_mb`` is the peak of the job's own simulator processes, set by
+    the caller on the phase that ran them, and None elsewhere.
+    """
+
+    def __init__(self):
+        self.phases: List[Dict[str, Any]] = []
+        self.profile_path: Optional[str] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, Any]]:
+        """
+        Time a phase. The caller may set the yielded record's ``bytes`` and
+        ``peak_rss_mb``.
+
+        Failed phases are recorded too, with ``ok`` set to False.
+        """
+        record = {
+            "name": name,
+            "seconds": 0.0,
+            "bytes": 0,
+            "ok": True,
+            "peak_rss_mb": None,
+        }
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record["ok"] = False
+            raise
+        finally:
+            record["seconds"] = round(time.perf_counter() - started, 3)
+            self.phases.append(record)
+
+    def record(self, name: str, seconds: float, bytes_moved: int = 0) -> None:
+        """Record a phase measured elsewhere, such as queue wait."""
+        self.phases.append(
+            {
+                "name": name,
+                "seconds": round(seconds, 3),
+                "bytes": bytes_moved,
+                "ok": True,
+                "peak_rss_mb": None,
+            }
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the structured timing record stored on the job."""
+        return {
+            "phases": self.phases,
+            "total_seconds": round(sum(p["seconds"] for p in self.phases), 3),
+            "profile_path": self.profile_path,
+        }
+
+
+@contextmanager
+def profiled(enabled: bool, output: Path) -> Iterator[None]:
+    """Capture a cProfile of the enclosed block into ``output`` if enabled."""
+    if not enabled:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(output))
@@ -4,6 +4,7 @@ import sys
 from pathlib import Path
 
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -30,7 +31,30 @@ app.conf.update(
     task_soft_time_limit=settings.max_simulation_time - 60,
     worker_prefetch_multiplier=1,  # One task at a time for long-running simulations
     worker_max_tasks_per_child=5,  # Restart worker after 5 tasks to prevent memory leaks
+    # The packer and post-processing run on their own queues so they never
+    # wait behind simulations
+    task_routes={
+        "workers.tasks.pack_small_jobs": {"queue": "packer"},
+        "workers.tasks.build_spatial_indexes": {"queue": "postprocess"},
+        "workers.tasks.build_snapshot_previews": {"queue": "postprocess"},
+        "workers.tasks.build_halo_catalogs": {"queue": "postprocess"},
+    },
+    beat_schedule={
+        "pack-small-jobs": {
+            "task": "workers.tasks.pack_small_jobs",
+            "schedule": settings.pack_interval_seconds,
+        },
+    },
 )
 
+
+@worker_process_init.connect
+def reset_database_pool(**kwargs):
+    """Drop pooled database connections inherited from the parent process."""
+    from common.database import engine
+
+    engine.dispose(close=False)
+
+
 if __name__ == "__main__":
     app.start()
@@ -0,0 +1,59 @@
+"""Shared test fixtures."""
+
+import sys
+from pathlib import Path
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from api.main import app  # noqa: E402
+from common.database import Base, get_db  # noqa: E402
+from common.redis_client import get_broker_redis, get_redis  # noqa: E402
+
+
+@pytest.fixture
+def session_factory():
+    """Session factory bound to a fresh in-memory SQLite database."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(session_factory):
+    """Session on the in-memory database."""
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def redis_stub():
+    """Local Redis stand-in."""
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def client(db_session, redis_stub):
+    """API test client wired to the in-memory database and Redis stand-in."""
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_broker_redis] = lambda: redis_stub
+    app.dependency_overrides[get_redis] = lambda: redis_stub
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
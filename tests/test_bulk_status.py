@@ -0,0 +1,82 @@
+"""Bulk job status endpoint tests."""
+
+from datetime import datetime
+
+from sqlalchemy import event
+
+from common.config import settings
+from common.models import JobStatus, SimulationJob
+
+URL = "/api/v1/jobs/status"
+
+
+def add_jobs(db_session, count):
+    for i in range(count):
+        db_session.add(
+            SimulationJob(
+                id=f"job-{i}",
+                name=f"job-{i}",
+                num_particles=1000,
+                box_size=10.0,
+                status=JobStatus.RUNNING if i % 2 else JobStatus.PENDING,
+                progress=float(i),
+                started_at=datetime(2024, 1, 1) if i % 2 else None,
+            )
+        )
+    db_session.commit()
+
+
+def test_statuses_in_request_order_with_missing(client, db_session):
+    add_jobs(db_session, 3)
+
+    response = client.post(URL, json={"ids": ["job-1", "nope", "job-0", "job-1"]})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["fields"] == [
+        "id",
+        "status",
+        "progress",
+        "created_at",
+        "started_at",
+        "completed_at",
+    ]
+    assert [row[:3] for row in data["jobs"]] == [
+        ["job-1", "running", 1.0],
+        ["job-0", "pending", 0.0],
+    ]
+    assert data["jobs"][0][4] == 1704067200.0
+    assert data["jobs"][1][4] is None
+    assert data["missing"] == ["nope"]
+
+
+def test_one_query_for_a_thousand_jobs_gzipped(client, db_session):
+    add_jobs(db_session, 1000)
+    statements = []
+    event.listen(
+        db_session.get_bind(),
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    response = client.post(
+        URL,
+        json={"ids": [f"job-{i}" for i in range(1000)]},
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["jobs"]) == 1000
+    assert len(statements) == 1
+
+
+def test_too_many_ids(client):
+    ids = [f"job-{i}" for i in range(settings.bulk_status_max_ids + 1)]
+    assert client.post(URL, json={"ids": ids}).status_code == 422
+    assert client.post(URL, json={"ids": []}).status_code == 422
+
+
+def test_id_list_capped_before_deduplication(client):
+    ids = ["job-0"] * (settings.bulk_status_max_ids + 1)
+    assert client.post(URL, json={"ids": ids}).status_code == 422
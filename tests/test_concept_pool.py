@@ -0,0 +1,170 @@
+"""Warm CONCEPT interpreter pool tests."""
+
+import json
+import shutil
+import subprocess
+import sysconfig
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common.config import settings
+from common.logs import LogCapture
+from workers.concept_pool import ConceptWarmPool
+from workers.runner import SimulationError
+
+FAKE_CONCEPT = """
+import json
+import os
+import sys
+import time
+
+import fake_commons
+
+params = sys.argv[1].split("=", 1)[1]
+# Module state set by an earlier job must not be visible here
+assert not hasattr(json, "leaked"), "state leaked between jobs"
+json.leaked = True
+# CONCEPT modules are imported by each job, here in its working directory
+assert fake_commons.WORK_DIR == os.getcwd(), "stale CONCEPT module"
+print("running", params)
+if params.endswith("slow.py"):
+    time.sleep(0.5)
+if params.endswith("fail.py"):
+    sys.exit(3)
+"""
+
+
+FAKE_COMMONS = """
+import os
+
+WORK_DIR = os.getcwd()
+with open(os.path.join(os.path.dirname(__file__), "imports.log"), "a") as log:
+    log.write(WORK_DIR + "\\n")
+"""
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    main_path = tmp_path / "main.py"
+    main_path.write_text(FAKE_CONCEPT)
+    (tmp_path / "fake_commons.py").write_text(FAKE_COMMONS)
+    for name, value in {
+        "concept_main_path": str(main_path),
+        "concept_preload_modules": ["json"],
+        "concept_source_modules": ["fake_commons"],
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+        env_value = value if isinstance(value, str) else json.dumps(value)
+        monkeypatch.setenv(name.upper(), env_value)
+    pool = ConceptWarmPool(size=1)
+    yield pool
+    pool.shutdown()
+
+
+def run_job(pool, tmp_path, name):
+    work_dir = tmp_path / name
+    work_dir.mkdir()
+    capture = LogCapture(name, work_dir / "simulation.log.gz")
+    try:
+        return pool.run(work_dir / f"{name}.py", work_dir, capture), capture
+    finally:
+        capture.close()
+
+
+def test_jobs_reuse_warm_interpreter_in_isolation(pool, tmp_path):
+    first, capture = run_job(pool, tmp_path, "first")
+    assert not first["reused"]
+    assert first["warmup_seconds"] > 0
+    assert list(capture.tail) == [f"running {tmp_path}/first/first.py"]
+
+    second, capture = run_job(pool, tmp_path, "second")
+    assert second["reused"]
+    assert second["warmup_seconds"] == 0.0
+    assert second["latency_seconds"] >= 0
+    assert second["startup_seconds"] >= 0
+    assert second["cold_startup_seconds"] == first["warmup_seconds"]
+    assert list(capture.tail) == [f"running {tmp_path}/second/second.py"]
+    assert pool.warmups == 1
+    # Never imported by the warm parent, imported fresh by each job
+    imports = (tmp_path / "imports.log").read_text().splitlines()
+    assert imports == [str(tmp_path / "first"), str(tmp_path / "second")]
+
+
+def test_failed_job_does_not_poison_pool(pool, tmp_path):
+    with pytest.raises(SimulationError, match="code 3"):
+        run_job(pool, tmp_path, "fail")
+
+    report, _ = run_job(pool, tmp_path, "after")
+    assert report["reused"]
+
+
+def test_interpreter_recycled_after_max_jobs(pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "concept_warm_max_jobs", 1)
+    run_job(pool, tmp_path, "first")
+    report, _ = run_job(pool, tmp_path, "second")
+    assert not report["reused"]
+    assert pool.warmups == 2
+
+
+# A single-phase init extension like Cython builds: once initialised in a
+# process, re-importing it returns the first instance's state
+FAKE_EXTENSION = r"""
+#include <Python.h>
+
+static struct PyModuleDef module = {PyModuleDef_HEAD_INIT, "fake_mesh", NULL, -1};
+
+PyMODINIT_FUNC PyInit_fake_mesh(void) {
+    PyObject *m = PyModule_Create(&module);
+    PyObject *os = PyImport_ImportModule("os");
+    PyObject *cwd = os ? PyObject_CallMethod(os, "getcwd", NULL) : NULL;
+    Py_XDECREF(os);
+    if (m == NULL || cwd == NULL || PyModule_AddObject(m, "WORK_DIR", cwd) < 0) {
+        Py_XDECREF(cwd);
+        Py_XDECREF(m);
+        return NULL;
+    }
+    return m;
+}
+"""
+
+
+def test_reserved_interpreters_are_released(pool, tmp_path):
+    with pool.reserve(2):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(
+                executor.map(
+                    lambda name: run_job(pool, tmp_path, name), ["aslow", "bslow"]
+                )
+            )
+        assert pool.warmups == 2
+    assert pool.size == 1
+    assert len(pool._idle) == 1
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="needs a C compiler")
+def test_compiled_modules_are_imported_per_job(pool, tmp_path, monkeypatch):
+    source = tmp_path / "fake_mesh.c"
+    source.write_text(FAKE_EXTENSION)
+    subprocess.run(
+        [
+            "cc",
+            "-shared",
+            "-fPIC",
+            f"-I{sysconfig.get_paths()['include']}",
+            str(source),
+            "-o",
+            str(tmp_path / f"fake_mesh{sysconfig.get_config_var('EXT_SUFFIX')}"),
+        ],
+        check=True,
+    )
+    (tmp_path / "main.py").write_text(
+        FAKE_CONCEPT.replace("import fake_commons", "import fake_mesh as fake_commons")
+    )
+    monkeypatch.setattr(settings, "concept_source_modules", ["fake_mesh"])
+    monkeypatch.setenv("CONCEPT_SOURCE_MODULES", json.dumps(["fake_mesh"]))
+
+    for name in ("first", "second"):
+        report, capture = run_job(pool, tmp_path, name)
+        assert list(capture.tail) == [f"running {tmp_path}/{name}/{name}.py"]
+    assert report["reused"]
@@ -0,0 +1,104 @@
+"""Friends-of-Friends halo catalog tests."""
+
+import h5py
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from common import database, storage
+from common.models import JobStatus, SimulationJob
+from common.storage import LocalStorage
+from workers import tasks
+from workers.halos import fof_groups, find_halos
+
+BOX = 100.0
+
+
+def clustered_positions(rng):
+    """Three tight clumps (one across the periodic boundary) and background."""
+    clumps = [
+        (np.array([20.0, 20.0, 20.0]), 400),
+        (np.array([60.0, 70.0, 50.0]), 250),
+        (np.array([99.5, 50.0, 0.5]), 100),
+    ]
+    parts = [np.mod(c + rng.normal(0, 0.3, (n, 3)), BOX) for c, n in clumps]
+    parts.append(rng.uniform(0, BOX, (2000, 3)))
+    return np.concatenate(parts), clumps
+
+
+def test_fof_groups_match_connected_components():
+    rng = np.random.default_rng(1)
+    positions, _ = clustered_positions(rng)
+    link = 1.0
+
+    labels = fof_groups(positions, BOX, link, chunk=333)
+
+    pairs = cKDTree(positions, boxsize=BOX).query_pairs(link, output_type="ndarray")
+    n = len(positions)
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), (n, n))
+    _, expected = connected_components(graph, directed=False)
+    # Same partition: labels map one-to-one onto components
+    assert len(set(zip(labels, expected))) == len(set(expected)) == len(set(labels))
+
+
+def write_snapshot(path, positions, velocities):
+    with h5py.File(path, "w") as f:
+        header = f.create_group("Header")
+        header.attrs["BoxSize"] = BOX
+        header.attrs["MassTable"] = np.array([0.0, 2.0, 0, 0, 0, 0])
+        group = f.create_group("PartType1")
+        group["Coordinates"] = positions.astype(np.float32)
+        group["Velocities"] = velocities.astype(np.float32)
+        group["ParticleIDs"] = np.arange(len(positions), dtype=np.uint64)
+
+
+def test_halo_catalog_task(tmp_path, monkeypatch, session_factory):
+    rng = np.random.default_rng(2)
+    positions, clumps = clustered_positions(rng)
+    velocities = rng.normal(0, 50.0, positions.shape)
+    velocities[:400] = [100.0, 0.0, 0.0]  # First clump moves coherently
+    snapshot = tmp_path / "snapshot_000.hdf5"
+    write_snapshot(snapshot, positions, velocities)
+
+    backend = LocalStorage(str(tmp_path / "results"))
+    monkeypatch.setattr(storage, "_backend", backend)
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    key = "halo-job/output/snapshot_000.hdf5"
+    backend.upload_file(snapshot, key)
+    with database.session_scope() as db:
+        db.add(
+            SimulationJob(
+                id="halo-job",
+                name="halos",
+                num_particles=len(positions),
+                box_size=BOX,
+                status=JobStatus.COMPLETED,
+                output_files=[key],
+            )
+        )
+
+    result = tasks.build_halo_catalogs("halo-job")
+
+    catalog_key = "halo-job/halos/snapshot_000.fof.hdf5"
+    assert result["catalogs"] == [catalog_key]
+    assert tasks.load_job("halo-job").output_files == [key, catalog_key]
+    with h5py.File(backend.path(catalog_key), "r") as f:
+        lengths = f["Group/GroupLen"][:]
+        assert list(lengths[:3]) == [400, 250, 100]
+        assert np.all(lengths >= 20)
+        np.testing.assert_allclose(f["Group/GroupMass"][:3], 2.0 * lengths[:3])
+        for (center, _), found in zip(clumps, f["Group/GroupPos"][:3]):
+            offset = np.abs(found - center)
+            np.testing.assert_array_less(np.minimum(offset, BOX - offset), 0.1)
+        np.testing.assert_allclose(f["Group/GroupVel"][0], [100.0, 0, 0], atol=1e-3)
+        assert f["Group/GroupVelDisp"][0] < 1e-3
+        assert 40 < f["Group/GroupVelDisp"][1] < 60
+
+
+def test_find_halos_without_groups(tmp_path):
+    rng = np.random.default_rng(3)
+    positions = rng.uniform(0, BOX, (500, 3))
+    write_snapshot(tmp_path / "snap.hdf5", positions, np.zeros_like(positions))
+    catalog = find_halos([tmp_path / "snap.hdf5"])
+    assert len(catalog["GroupLen"]) == 0
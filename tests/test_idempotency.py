@@ -0,0 +1,72 @@
+"""Idempotency-Key job submission tests."""
+
+from api.routers import jobs
+from common.models import SimulationJob
+
+JOB = {"name": "sweep-1", "num_particles": 10000, "box_size": 50.0}
+
+
+def test_retry_returns_original_job(client, db_session):
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/api/v1/jobs", json=JOB, headers=headers)
+    second = client.post("/api/v1/jobs", json=JOB, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json()["id"] == first.json()["id"]
+    assert db_session.query(SimulationJob).count() == 1
+
+
+def test_database_backs_expired_cache(client, db_session, redis_stub):
+    headers = {"Idempotency-Key": "retry-2"}
+    first = client.post("/api/v1/jobs", json=JOB, headers=headers)
+    redis_stub.flushall()
+
+    second = client.post("/api/v1/jobs", json=JOB, headers=headers)
+    assert second.json()["id"] == first.json()["id"]
+    assert db_session.query(SimulationJob).count() == 1
+
+
+def test_key_reuse_with_different_body_is_rejected(client):
+    headers = {"Idempotency-Key": "retry-3"}
+    client.post("/api/v1/jobs", json=JOB, headers=headers)
+
+    response = client.post(
+        "/api/v1/jobs", json={**JOB, "num_particles": 20000}, headers=headers
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        "/api/v1/jobs", json={**JOB, "profile": True}, headers=headers
+    )
+    assert response.status_code == 422
+
+
+def test_jobs_without_key_are_not_deduplicated(client, db_session):
+    client.post("/api/v1/jobs", json=JOB)
+    client.post("/api/v1/jobs", json=JOB)
+    assert db_session.query(SimulationJob).count() == 2
+
+
+def test_concurrent_retry_loses_insert_race(client, db_session, monkeypatch):
+    headers = {"Idempotency-Key": "retry-4"}
+    first = client.post("/api/v1/jobs", json=JOB, headers=headers)
+    # A concurrent retry that checked Redis and the database before the first
+    # request committed: its insert hits the unique index instead
+    lookup = jobs._find_idempotent_job
+    calls = []
+
+    def find_after_insert(db, cache, key):
+        calls.append(key)
+        return lookup(db, cache, key) if len(calls) > 1 else None
+
+    monkeypatch.setattr(jobs, "_find_idempotent_job", find_after_insert)
+
+    second = client.post("/api/v1/jobs", json=JOB, headers=headers)
+
+    assert second.status_code == 201
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json()["id"] == first.json()["id"]
+    assert db_session.query(SimulationJob).count() == 1
+    assert len(calls) == 2
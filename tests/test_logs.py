@@ -0,0 +1,123 @@
+"""Simulator log capture and log endpoint tests."""
+
+import gzip
+import threading
+import time
+
+import pytest
+
+from common import storage
+from common.logs import LogCapture, log_object_key
+from common.models import JobStatus, SimulationJob
+from common.storage import LocalStorage
+
+LINES = [f"Sync-Point {i}, Time: {i / 1000}, Redshift: 0" for i in range(2000)]
+TEXT = "".join(line + "\n" for line in LINES)
+
+
+@pytest.fixture
+def stored_job(tmp_path, monkeypatch, db_session, redis_stub):
+    """A finished job whose compressed log has been uploaded."""
+    backend = LocalStorage(str(tmp_path / "results"))
+    monkeypatch.setattr(storage, "_backend", backend)
+
+    capture = LogCapture("job-1", tmp_path / "simulation.log.gz", cache=redis_stub)
+    capture.writer.chunk_bytes = 4096
+    for line in LINES:
+        capture.write(line + "\n")
+    capture.close()
+
+    key = log_object_key("job-1")
+    backend.upload_file(capture.index_path, key + ".idx")
+    db_session.add(
+        SimulationJob(
+            id="job-1",
+            name="logs",
+            num_particles=1000,
+            box_size=10.0,
+            status=JobStatus.FAILED,
+            log_path=backend.upload_file(capture.path, key),
+        )
+    )
+    db_session.commit()
+    return capture
+
+
+def test_compressed_log_is_plain_gzip(stored_job):
+    assert len(stored_job.writer.members) > 1
+    assert gzip.decompress(stored_job.path.read_bytes()).decode() == TEXT
+
+
+def test_live_tail_is_bounded(stored_job, redis_stub):
+    assert redis_stub.llen("job:job-1:log") == 1000
+    assert list(stored_job.tail)[-1] == LINES[-1]
+
+
+def test_tail_endpoint(client, stored_job, redis_stub):
+    response = client.get("/api/v1/jobs/job-1/logs?tail=3")
+    assert response.text.splitlines() == LINES[-3:]
+
+    redis_stub.flushall()
+    response = client.get("/api/v1/jobs/job-1/logs?tail=1500")
+    assert response.text.splitlines() == LINES[-1500:]
+
+
+def test_range_endpoint(client, stored_job):
+    response = client.get(
+        "/api/v1/jobs/job-1/logs", headers={"Range": "bytes=10000-20000"}
+    )
+    assert response.status_code == 206
+    assert response.text == TEXT[10000:20001]
+    assert response.headers["Content-Range"] == f"bytes 10000-20000/{len(TEXT)}"
+
+    response = client.get("/api/v1/jobs/job-1/logs", headers={"Range": "bytes=-10"})
+    assert response.text == TEXT[-10:]
+
+    response = client.get(
+        "/api/v1/jobs/job-1/logs", headers={"Range": f"bytes={len(TEXT)}-"}
+    )
+    assert response.status_code == 416
+
+
+def test_last_lines_reach_redis_while_silent(tmp_path, redis_stub):
+    capture = LogCapture(
+        "job-2", tmp_path / "simulation.log.gz", cache=redis_stub, flush_interval=0.05
+    )
+    capture.write("first\n")
+    capture.write("before a long silent phase\n")
+    try:
+        deadline = time.monotonic() + 2
+        while redis_stub.llen("job:job-2:log") < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert redis_stub.lrange("job:job-2:log", 0, -1)[-1] == (
+            "before a long silent phase"
+        )
+    finally:
+        capture.close()
+
+
+def test_slow_redis_does_not_block_writer(tmp_path, redis_stub, monkeypatch):
+    release = threading.Event()
+    pipeline = redis_stub.pipeline
+
+    def slow_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+        pipe.execute = lambda: release.wait(5) and execute()
+        return pipe
+
+    monkeypatch.setattr(redis_stub, "pipeline", slow_pipeline)
+    capture = LogCapture(
+        "job-3", tmp_path / "simulation.log.gz", cache=redis_stub, flush_interval=0.01
+    )
+    try:
+        started = time.monotonic()
+        for i in range(100):
+            capture.write(f"line {i}\n")
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        capture.close()
+    assert redis_stub.lrange("job:job-3:log", 0, -1) == [
+        f"line {i}" for i in range(100)
+    ]
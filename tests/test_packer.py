@@ -0,0 +1,244 @@
+"""Bin-packing of small jobs tests."""
+
+import signal
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from billiard.exceptions import TimeLimitExceeded
+from celery.exceptions import SoftTimeLimitExceeded
+
+from common import database
+from common.logs import LogCapture
+from common.models import JobStatus, SimulationJob, SimulatorType
+from workers import tasks
+from workers.concept_pool import ConceptWarmPool
+from workers.packer import PackItem, assign_cpus, pack_jobs
+from workers.runner import SimulationError, run_process
+
+
+def test_pack_jobs_respects_cores_and_memory():
+    items = [PackItem(f"mem-{i}", 1, 6000) for i in range(3)]
+    items += [PackItem(f"cpu-{i}", 1, 100) for i in range(10)]
+
+    bins = pack_jobs(items, cores=8, memory_mb=14000)
+
+    assert sorted(sum(bins, [])) == sorted(item.job_id for item in items)
+    by_id = {item.job_id: item for item in items}
+    for job_ids in bins:
+        assert sum(by_id[j].cores for j in job_ids) <= 8
+        assert sum(by_id[j].memory_mb for j in job_ids) <= 14000
+    assert len(bins) == 2
+
+
+def test_assign_cpus_is_disjoint():
+    assert assign_cpus([1, 1, 2], [3, 0, 1, 2]) == [[0], [1], [2, 3]]
+    assert assign_cpus([1, 1, 1], [0, 1]) == [[0], [1], [0]]
+
+
+def test_pack_small_jobs_claims_and_dispatches(
+    db_session, session_factory, monkeypatch
+):
+    for i in range(20):
+        db_session.add(
+            SimulationJob(
+                id=f"small-{i}",
+                name="small",
+                simulator_type=SimulatorType.CONCEPT,
+                queue="concept",
+                num_particles=10000,
+                box_size=50.0,
+                status=JobStatus.PENDING,
+            )
+        )
+    db_session.add(
+        SimulationJob(
+            id="large",
+            name="large",
+            queue="gadget4",
+            num_particles=10_000_000,
+            box_size=500.0,
+            status=JobStatus.PENDING,
+        )
+    )
+    db_session.commit()
+
+    sent = []
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    monkeypatch.setattr(
+        tasks.run_packed_simulations,
+        "apply_async",
+        lambda args, queue, task_id: sent.append((args[0], queue, task_id)),
+    )
+
+    batch_ids = tasks.pack_small_jobs()
+
+    # 20 single-core jobs on 8-core concept workers
+    assert [len(job_ids) for job_ids, _, _ in sent] == [8, 8, 4]
+    assert {queue for _, queue, _ in sent} == {"concept"}
+    assert batch_ids == [task_id for _, _, task_id in sent]
+
+    db_session.expire_all()
+    assert db_session.get(SimulationJob, "large").celery_task_id is None
+    assert db_session.get(SimulationJob, "small-0").celery_task_id in batch_ids
+
+    # Claimed jobs are not packed again
+    sent.clear()
+    assert tasks.pack_small_jobs() == []
+
+
+def add_small_jobs(db_session, count, **fields):
+    for i in range(count):
+        db_session.add(
+            SimulationJob(
+                id=f"small-{i}",
+                name="small",
+                simulator_type=SimulatorType.CONCEPT,
+                queue="concept",
+                num_particles=10000,
+                box_size=50.0,
+                status=JobStatus.PENDING,
+                **fields,
+            )
+        )
+    db_session.commit()
+
+
+def test_failed_dispatch_releases_claim(db_session, session_factory, monkeypatch):
+    add_small_jobs(db_session, 2)
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+
+    def broker_down(args, queue, task_id):
+        raise ConnectionError("broker unavailable")
+
+    monkeypatch.setattr(tasks.run_packed_simulations, "apply_async", broker_down)
+    assert tasks.pack_small_jobs() == []
+
+    db_session.expire_all()
+    job = db_session.get(SimulationJob, "small-0")
+    assert job.celery_task_id is None and job.claimed_at is None
+
+
+def test_stale_claims_are_repacked(db_session, session_factory, monkeypatch):
+    add_small_jobs(
+        db_session,
+        2,
+        celery_task_id="lost-batch",
+        claimed_at=datetime.utcnow() - timedelta(hours=2),
+    )
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    sent = []
+    monkeypatch.setattr(
+        tasks.run_packed_simulations,
+        "apply_async",
+        lambda args, queue, task_id: sent.append(args[0]),
+    )
+
+    [batch_id] = tasks.pack_small_jobs()
+
+    assert sorted(sent[0]) == ["small-0", "small-1"]
+    # The lost batch no longer owns the jobs if it is delivered after all
+    assert tasks.start_batch("lost-batch", ["small-0", "small-1"]) == []
+    assert tasks.start_batch(batch_id, ["small-0"]) == ["small-0"]
+
+
+def test_failed_batch_fails_unfinished_jobs(db_session, session_factory, monkeypatch):
+    add_small_jobs(db_session, 3, celery_task_id="batch-1")
+    db_session.get(SimulationJob, "small-0").status = JobStatus.COMPLETED
+    db_session.get(SimulationJob, "small-1").status = JobStatus.RUNNING
+    db_session.commit()
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+
+    tasks.run_packed_simulations.on_failure(
+        TimeLimitExceeded(3600),
+        "batch-1",
+        [["small-0", "small-1", "small-2"]],
+        {},
+        "einfo",
+    )
+
+    db_session.expire_all()
+    statuses = [db_session.get(SimulationJob, f"small-{i}").status for i in range(3)]
+    assert statuses == [JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.FAILED]
+
+
+def test_warm_pool_grows_only_for_concept_jobs(
+    db_session, session_factory, monkeypatch
+):
+    add_small_jobs(db_session, 2, celery_task_id="batch-1")
+    db_session.add(
+        SimulationJob(
+            id="gadget",
+            name="small",
+            simulator_type=SimulatorType.GADGET4,
+            num_particles=10000,
+            box_size=50.0,
+            status=JobStatus.PENDING,
+            celery_task_id="batch-1",
+        )
+    )
+    db_session.commit()
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    pool = ConceptWarmPool(1)
+    monkeypatch.setattr(tasks, "get_warm_pool", lambda: pool)
+    sizes = []
+
+    def execute_job(job_id, cpus=None, memory_mb=None):
+        sizes.append(pool.size)
+        return {"job_id": job_id, "status": "completed"}
+
+    monkeypatch.setattr(tasks, "execute_job", execute_job)
+
+    tasks.run_packed_simulations.apply(
+        args=[["small-0", "small-1", "gadget"]], task_id="batch-1"
+    ).get()
+
+    assert sizes == [2, 2, 2]
+    assert pool.size == 1
+
+
+def test_soft_time_limit_kills_packed_simulators(
+    db_session, session_factory, monkeypatch, tmp_path
+):
+    add_small_jobs(db_session, 2, celery_task_id="batch-1")
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    outcomes = []
+
+    def execute_job(job_id, cpus=None, memory_mb=None):
+        capture = LogCapture(job_id, tmp_path / f"{job_id}.log.gz")
+        try:
+            run_process(["sleep", "30"], tmp_path, capture)
+        except SimulationError as e:
+            outcomes.append(e)
+            raise
+        finally:
+            capture.close()
+
+    monkeypatch.setattr(tasks, "execute_job", execute_job)
+
+    # Celery delivers the soft limit as an exception in the main thread
+    def soft_limit(signum, frame):
+        raise SoftTimeLimitExceeded()
+
+    previous = signal.signal(signal.SIGALRM, soft_limit)
+    signal.setitimer(signal.ITIMER_REAL, 0.5)
+    started = time.monotonic()
+    try:
+        with pytest.raises(SoftTimeLimitExceeded):
+            tasks.run_packed_simulations.apply(
+                args=[["small-0", "small-1"]], task_id="batch-1"
+            ).get()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+    deadline = time.monotonic() + 5
+    while len(outcomes) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(outcomes) == 2, "simulators were not killed"
+    assert time.monotonic() - started < 5
+
+    db_session.expire_all()
+    for job_id in ("small-0", "small-1"):
+        job = db_session.get(SimulationJob, job_id)
+        assert job.status == JobStatus.FAILED
@@ -0,0 +1,108 @@
+"""Pre-flight memory validation tests."""
+
+from common.config import settings
+from common.models import SimulationJob
+
+
+def test_small_job_is_routed(client, db_session):
+    job = {"name": "small", "num_particles": 10000, "box_size": 50.0}
+
+    report = client.post("/api/v1/jobs/preflight", json=job).json()
+    assert report["feasible"]
+    assert report["queue"] == "gadget4"
+    assert report["parameters"]["ParticleNumber"] == 10000
+    assert report["memory"]["pm_grid_mb"] > 0
+
+    response = client.post("/api/v1/jobs", json=job)
+    assert response.status_code == 201
+    assert response.json()["queue"] == "gadget4"
+
+
+def test_oversized_job_is_rejected(client, db_session):
+    job = {"name": "huge", "num_particles": 2_000_000_000, "box_size": 1000.0}
+
+    report = client.post("/api/v1/jobs/preflight", json=job).json()
+    assert not report["feasible"]
+    assert report["reasons"]
+
+    response = client.post("/api/v1/jobs", json=job)
+    assert response.status_code == 422
+    assert db_session.query(SimulationJob).count() == 0
+
+
+def test_max_mem_size_too_small(client):
+    job = {
+        "name": "tight",
+        "num_particles": 10_000_000,
+        "box_size": 100.0,
+        "parameters": {"MaxMemSize": 200},
+    }
+    report = client.post("/api/v1/jobs/preflight", json=job).json()
+    assert not report["feasible"]
+    assert "MaxMemSize" in report["reasons"][0]
+
+
+def test_non_numeric_max_mem_size_is_rejected(client, db_session):
+    job = {
+        "name": "units",
+        "num_particles": 10000,
+        "box_size": 50.0,
+        "parameters": {"MaxMemSize": "2G"},
+    }
+    response = client.post("/api/v1/jobs/preflight", json=job)
+    assert response.status_code == 422
+    assert "MaxMemSize" in response.text
+
+    assert client.post("/api/v1/jobs", json=job).status_code == 422
+    assert db_session.query(SimulationJob).count() == 0
+
+
+def test_concept_parameter_names_must_be_identifiers(client, db_session):
+    job = {
+        "name": "inject",
+        "simulator_type": "concept",
+        "num_particles": 10000,
+        "box_size": 50.0,
+        "parameters": {"import os; os.system('id') #": 1},
+    }
+    assert client.post("/api/v1/jobs/preflight", json=job).status_code == 422
+    assert client.post("/api/v1/jobs", json=job).status_code == 422
+    assert db_session.query(SimulationJob).count() == 0
+
+
+def test_concept_values_are_literals_or_safe_expressions(client):
+    job = {
+        "name": "values",
+        "simulator_type": "concept",
+        "num_particles": 10000,
+        "box_size": 50.0,
+        "parameters": {
+            "shortrange_scale": "1.25*boxsize/cbrt(N)",
+            "output_dirs": "__import__('os').system('id')",
+            "a_end": 1.0,
+        },
+    }
+    params = client.post("/api/v1/jobs/preflight", json=job).json()["parameters"]
+    assert params["shortrange_scale"] == "1.25 * boxsize / cbrt(N)"
+    assert params["output_dirs"] == repr("__import__('os').system('id')")
+    assert params["a_end"] == "1.0"
+
+
+def test_preflight_reports_tuned_parameters(client, monkeypatch):
+    monkeypatch.setattr(settings, "gadget4_auto_tune", True)
+    job = {
+        "name": "tuned",
+        "num_particles": 1_000_000,
+        "box_size": 100.0,
+        "parameters": {"TopNodeFactor": 3.0},
+    }
+
+    report = client.post("/api/v1/jobs/preflight", json=job).json()
+
+    params = report["parameters"]
+    assert 0 < params["MaxMemSize"] <= report["worker_memory_per_rank_mb"] - 300
+    assert params["NumFilesPerSnapshot"] == 1
+    assert params["ActivePartFracForNewDomainDecomp"] == 0.01
+    assert params["TopNodeFactor"] == 3.0
+    assert report["tuned_parameters"]["overridden"] == ["TopNodeFactor"]
+    assert report["tuned_parameters"]["history_jobs"] == 0
@@ -0,0 +1,122 @@
+"""Preview tile pyramid tests."""
+
+import struct
+import zlib
+
+import h5py
+import numpy as np
+import pytest
+
+from api.routers import jobs
+from common import database, storage
+from common.config import settings
+from common.models import JobStatus, SimulationJob
+from common.preview import PREVIEW_SUFFIX, TileCache, build_previews
+from common.storage import LocalStorage
+from workers import tasks
+
+BOX = 100.0
+
+
+def decode_png(data):
+    """Return the pixels of a PNG written by encode_png."""
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    width, height = struct.unpack(">II", data[16:24])
+    idat_length = struct.unpack(">I", data[33:37])[0]
+    raw = zlib.decompress(data[41 : 41 + idat_length])
+    return np.frombuffer(raw, np.uint8).reshape(height, width + 1)[:, 1:]
+
+
+def write_snapshot(path):
+    # All particles in the top-left corner (low x, high y)
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0, BOX, (1000, 3))
+    positions[:, 0] = rng.uniform(0, 20, 1000)
+    positions[:, 1] = rng.uniform(80, 100, 1000)
+    with h5py.File(path, "w") as f:
+        f.create_group("Header").attrs["BoxSize"] = BOX
+        f.create_group("PartType1")["Coordinates"] = positions.astype(np.float32)
+
+
+@pytest.fixture
+def preview(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "preview_tile_size", 16)
+    monkeypatch.setattr(settings, "preview_max_zoom", 2)
+    write_snapshot(tmp_path / "snapshot_002.hdf5")
+    [output] = build_previews(tmp_path)
+    assert output.name == f"snapshot_002{PREVIEW_SUFFIX}"
+    return output
+
+
+def test_pyramid_tiles(preview, client, tmp_path, monkeypatch, db_session):
+    backend = LocalStorage(str(tmp_path / "results"))
+    monkeypatch.setattr(storage, "_backend", backend)
+    monkeypatch.setattr(jobs, "_tile_cache", TileCache(1 << 20))
+    for path in (preview, preview.with_name(preview.name + ".idx")):
+        backend.upload_file(path, f"job-p/output/{path.name}")
+    db_session.add(SimulationJob(id="job-p", name="p", num_particles=1, box_size=BOX))
+    db_session.commit()
+
+    top = client.get("/api/v1/jobs/job-p/preview/2/2/0/0")
+    assert top.status_code == 200
+    assert top.headers["content-type"] == "image/png"
+    assert "max-age" in top.headers["cache-control"]
+    assert decode_png(top.content).shape == (16, 16)
+    assert decode_png(top.content).max() == 255
+    empty = client.get("/api/v1/jobs/job-p/preview/2/2/3/3")
+    assert decode_png(empty.content).max() == 0
+
+    whole = decode_png(client.get("/api/v1/jobs/job-p/preview/2/0/0/0").content)
+    assert whole[:4, :4].min() > 0 and whole[4:, :].max() == 0
+
+    cached = client.get(
+        "/api/v1/jobs/job-p/preview/2/2/0/0",
+        headers={"If-None-Match": top.headers["etag"]},
+    )
+    assert cached.status_code == 304
+    assert client.get("/api/v1/jobs/job-p/preview/2/3/0/0").status_code == 404
+    assert client.get("/api/v1/jobs/job-p/preview/2/1/0/0").status_code == 200
+
+
+def test_preview_task(tmp_path, monkeypatch, session_factory):
+    monkeypatch.setattr(settings, "preview_tile_size", 16)
+    monkeypatch.setattr(settings, "preview_max_zoom", 1)
+    snapshot = tmp_path / "snapshot_002.hdf5"
+    write_snapshot(snapshot)
+    backend = LocalStorage(str(tmp_path / "results"))
+    monkeypatch.setattr(storage, "_backend", backend)
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    key = "job-q/output/snapshot_002.hdf5"
+    backend.upload_file(snapshot, key)
+    with database.session_scope() as db:
+        db.add(
+            SimulationJob(
+                id="job-q",
+                name="q",
+                num_particles=1000,
+                box_size=BOX,
+                status=JobStatus.COMPLETED,
+                output_files=[key],
+            )
+        )
+
+    result = tasks.build_snapshot_previews("job-q")
+
+    preview_keys = [
+        "job-q/output/snapshot_002.preview",
+        "job-q/output/snapshot_002.preview.idx",
+    ]
+    assert result["previews"] == preview_keys
+    assert tasks.load_job("job-q").output_files == [key] + preview_keys
+    assert backend.path(preview_keys[0]).stat().st_size > 0
+
+
+def test_tile_cache_evicts_least_recently_used():
+    cache = TileCache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size == 8
@@ -0,0 +1,54 @@
+"""Queue depth and autoscaling signal tests."""
+
+from datetime import datetime, timedelta, timezone
+
+from common.models import JobStatus, SimulationJob, SimulatorType
+
+
+def add_job(db, job_id, simulator_type, num_particles, status, age_seconds=0):
+    db.add(
+        SimulationJob(
+            id=job_id,
+            name=job_id,
+            simulator_type=simulator_type,
+            queue=simulator_type.value,
+            num_particles=num_particles,
+            box_size=50.0,
+            status=status,
+            created_at=datetime.now(timezone.utc) - timedelta(seconds=age_seconds),
+        )
+    )
+    db.commit()
+
+
+def test_queue_stats(client, db_session, redis_stub):
+    add_job(db_session, "a", SimulatorType.GADGET4, 1_000_000, JobStatus.PENDING, 600)
+    add_job(db_session, "b", SimulatorType.GADGET4, 3_000_000, JobStatus.PENDING, 60)
+    add_job(db_session, "c", SimulatorType.GADGET4, 5_000_000, JobStatus.RUNNING)
+    add_job(db_session, "d", SimulatorType.CONCEPT, 10_000, JobStatus.COMPLETED)
+    redis_stub.rpush("gadget4", "msg-a", "msg-b")
+
+    response = client.get("/api/v1/queues")
+    assert response.status_code == 200
+    queues = {q["queue"]: q for q in response.json()["queues"]}
+
+    gadget4 = queues["gadget4"]
+    assert gadget4["pending_jobs"] == 2
+    assert gadget4["queued_messages"] == 2
+    assert gadget4["pending_core_hours"] == 8.0
+    assert 590 < gadget4["oldest_pending_age_seconds"] < 700
+
+    concept = queues["concept"]
+    assert concept["pending_jobs"] == 0
+    assert concept["queued_messages"] == 0
+    assert concept["oldest_pending_age_seconds"] == 0.0
+
+
+def test_prometheus_metrics(client, db_session, redis_stub):
+    add_job(db_session, "a", SimulatorType.CONCEPT, 10_000, JobStatus.PENDING)
+    redis_stub.rpush("concept", "msg-a")
+
+    response = client.get("/api/v1/metrics")
+    assert response.status_code == 200
+    assert 'gadget4_queue_pending_jobs{queue="concept"} 1.0' in response.text
+    assert 'gadget4_queue_messages{queue="concept"} 1.0' in response.text
@@ -0,0 +1,216 @@
+"""Spatial index and region query tests."""
+
+import json
+
+import h5py
+import numpy as np
+import pytest
+
+from common import database, storage
+from common.config import settings
+from common.models import JobStatus, SimulationJob
+from common.spatial import (
+    CELLS_SUFFIX,
+    RegionTooLarge,
+    build_spatial_index,
+    find_snapshots,
+    query_region,
+    read_cell_offsets,
+)
+from common.storage import LocalStorage
+from workers import tasks
+
+BOX = 100.0
+N = 5000
+
+
+def write_snapshot(output_dir, files=2, seed=0):
+    """Write a multi-file Gadget-style snapshot of random particles."""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(0, BOX, (N, 3)).astype(np.float32)
+    velocities = rng.normal(0, 100, (N, 3)).astype(np.float32)
+    ids = np.arange(N, dtype=np.uint64)
+    snapdir = output_dir / "snapdir_000"
+    snapdir.mkdir(parents=True)
+    for i, part in enumerate(np.array_split(np.arange(N), files)):
+        with h5py.File(snapdir / f"snapshot_000.{i}.hdf5", "w") as f:
+            f.create_group("Header").attrs["BoxSize"] = BOX
+            group = f.create_group("PartType1")
+            group["Coordinates"] = positions[part]
+            group["Velocities"] = velocities[part]
+            group["ParticleIDs"] = ids[part]
+    return positions, velocities
+
+
+def file_reader(path):
+    def read(start, end):
+        with open(path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    return read
+
+
+@pytest.fixture
+def indexed(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "spatial_index_chunk_rows", 700)
+    output_dir = tmp_path / "output"
+    positions, velocities = write_snapshot(output_dir)
+    snapshots = find_snapshots(output_dir)
+    assert list(snapshots) == ["snapshot_000"]
+    output = output_dir / f"snapshot_000{CELLS_SUFFIX}"
+    index = build_spatial_index(snapshots["snapshot_000"], output, grid=8)
+    return output, index, positions, velocities
+
+
+def test_sorted_file_keeps_every_particle(indexed):
+    output, index, positions, velocities = indexed
+    with h5py.File(output, "r") as f:
+        ids = f["PartType1/ParticleIDs"][:]
+        assert sorted(ids) == list(range(N))
+        np.testing.assert_array_equal(f["PartType1/Coordinates"][:], positions[ids])
+        np.testing.assert_array_equal(f["PartType1/Velocities"][:], velocities[ids])
+        assert f["PartType1/CellOffsets"][-1] == N
+
+
+def test_box_query_wraps_and_reads_only_overlapping_cells(indexed):
+    output, index, positions, _ = indexed
+    lower, upper = (-10.0, 20.0, 30.0), (15.0, 40.0, 45.0)
+    particles, bytes_read = query_region(
+        file_reader(output), index, "PartType1", lower, upper, gap_rows=0
+    )
+
+    shifted = np.mod(positions - np.array(lower), BOX)
+    expected = np.flatnonzero(np.all(shifted <= np.subtract(upper, lower), axis=1))
+    assert sorted(particles["ParticleIDs"]) == list(expected)
+    assert bytes_read < output.stat().st_size / 4
+
+
+def test_nearby_rows_are_read_together(indexed):
+    output, index, _, _ = indexed
+    requests = []
+    read = file_reader(output)
+
+    def counting_read(start, end):
+        requests.append((start, end))
+        return read(start, end)
+
+    lower, upper = (10.0, 10.0, 10.0), (60.0, 60.0, 60.0)
+    exact, _ = query_region(counting_read, index, "PartType1", lower, upper, gap_rows=0)
+    separate = len(requests)
+    requests.clear()
+
+    offsets = read_cell_offsets(read, index, "PartType1")
+    merged, _ = query_region(
+        counting_read,
+        index,
+        "PartType1",
+        lower,
+        upper,
+        cell_offsets=offsets,
+        gap_rows=N,
+    )
+
+    # One read per field; the cached offsets are not read again
+    assert len(requests) == 3 < separate
+    assert sorted(merged["ParticleIDs"]) == sorted(exact["ParticleIDs"])
+
+
+def test_sphere_query(indexed):
+    output, index, positions, _ = indexed
+    center, radius = (95.0, 50.0, 2.0), 12.0
+    lower = [c - radius for c in center]
+    upper = [c + radius for c in center]
+    particles, _ = query_region(
+        file_reader(output), index, "PartType1", lower, upper, (center, radius)
+    )
+
+    delta = positions - np.array(center)
+    delta -= BOX * np.round(delta / BOX)
+    expected = np.flatnonzero(np.sum(delta**2, axis=1) <= radius**2)
+    assert sorted(particles["ParticleIDs"]) == list(expected)
+
+
+def test_region_limit(indexed):
+    output, index, _, _ = indexed
+    with pytest.raises(RegionTooLarge):
+        query_region(
+            file_reader(output),
+            index,
+            "PartType1",
+            (0, 0, 0),
+            (BOX, BOX, BOX),
+            max_particles=100,
+        )
+
+
+def test_region_endpoint(indexed, tmp_path, monkeypatch, client, db_session):
+    output, _, _, _ = indexed
+    backend = LocalStorage(str(tmp_path / "results"))
+    monkeypatch.setattr(storage, "_backend", backend)
+    for path in (output, output.with_name(output.name + ".idx")):
+        backend.upload_file(path, f"job-1/output/{path.name}")
+    db_session.add(SimulationJob(id="job-1", name="a", num_particles=N, box_size=BOX))
+    db_session.commit()
+
+    url = "/api/v1/jobs/job-1/snapshots/0/region"
+    response = client.post(url, json={"center": [50, 50, 50], "radius": 10})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == len(data["ids"]) == len(data["positions"])
+    assert data["velocities"] is not None
+
+    assert client.post(url, json={"center": [50, 50, 50]}).status_code == 422
+    missing = "/api/v1/jobs/job-1/snapshots/1/region"
+    box = {"lower": [0, 0, 0], "upper": [1, 1, 1]}
+    assert client.post(missing, json=box).status_code == 404
+
+
+def test_spatial_index_task(tmp_path, monkeypatch, session_factory):
+    write_snapshot(tmp_path / "output")
+    backend = LocalStorage(str(tmp_path / "results"))
+    monkeypatch.setattr(storage, "_backend", backend)
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    keys = [f"job-2/output/snapdir_000/snapshot_000.{i}.hdf5" for i in range(2)]
+    for key in keys:
+        backend.upload_file(tmp_path / key.split("/", 1)[1], key)
+    with database.session_scope() as db:
+        db.add(
+            SimulationJob(
+                id="job-2",
+                name="index",
+                num_particles=N,
+                box_size=BOX,
+                status=JobStatus.COMPLETED,
+                output_files=keys,
+            )
+        )
+
+    result = tasks.build_spatial_indexes("job-2")
+
+    index_keys = [
+        "job-2/output/snapshot_000.cells.hdf5",
+        "job-2/output/snapshot_000.cells.hdf5.idx",
+    ]
+    assert result["indexes"] == index_keys
+    assert tasks.load_job("job-2").output_files == keys + index_keys
+    output = backend.path(index_keys[0])
+    index = json.loads(backend.path(index_keys[1]).read_text())
+    particles, _ = query_region(
+        file_reader(output), index, "PartType1", (0, 0, 0), (BOX, BOX, BOX)
+    )
+    assert sorted(particles["ParticleIDs"]) == list(range(N))
+
+
+def test_postprocessing_queued_for_runs_with_snapshots(monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        tasks.build_spatial_indexes, "apply_async", lambda args: queued.append(args)
+    )
+    monkeypatch.setattr(settings, "previews_after_run", False)
+    monkeypatch.setattr(settings, "halo_catalogs_after_run", False)
+
+    tasks.queue_postprocessing("job-3", ["job-3/output/parameters.txt"])
+    assert queued == []
+    tasks.queue_postprocessing("job-3", ["job-3/output/snapshot_000.hdf5"])
+    assert queued == [["job-3"]]
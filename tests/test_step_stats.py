@@ -0,0 +1,128 @@
+"""Gadget4 per-step statistics ingestion tests."""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from common import database
+from common.models import SimulationJob, SimulationStep
+from workers import gadget4_stats
+from workers.gadget4_stats import StepStatsIngester
+
+
+def cpu_block(step: int, total: float) -> str:
+    return (
+        f"Step {step}, Time: {0.01 * (step + 1)}, CPUs: 4, HighestActiveTimeBin: 20\n"
+        "                          diff               cumulative\n"
+        f"total                {total:8.2f}  100.0%  {total:10.2f}  100.0%\n"
+        "treegrav                 0.50   50.0%        0.50   50.0%\n"
+        "   treebuild             0.10   10.0%        0.10   10.0%\n"
+        "pm_grav                  0.20   20.0%        0.20   20.0%\n"
+        "domain                   0.10   10.0%        0.10   10.0%\n"
+        "i/o                      0.05    5.0%        0.05    5.0%\n"
+        "\n"
+    )
+
+
+def timings_block(step: int, balance: float) -> str:
+    return (
+        f"Step(*): {step}, t: 0.01, dt: 0.001, highest active timebin: 20\n"
+        "Nf=       32768  timebin=   20  total-Nf=32768\n"
+        f"   work-load balance: {balance}   part/sec: raw=1e6, effective=9e5\n"
+    )
+
+
+def balance_line(step: int, active: int) -> str:
+    return f"Step={step:7d}  sec={1.0:10.3f} Nsync-grv={active:10d} Nsync-hyd=0  *\n"
+
+
+@pytest.fixture
+def job(session_factory, monkeypatch):
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    with database.session_scope() as db:
+        db.add(SimulationJob(id="stats", name="stats", num_particles=1, box_size=1))
+    return "stats"
+
+
+def append(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_incremental_ingestion(job, tmp_path):
+    ingester = StepStatsIngester(job, tmp_path)
+    assert ingester.poll() == 0  # Files not written yet
+
+    append(tmp_path / "balance.txt", "Gadget4 balance legend\n")
+    for step in range(2):
+        append(tmp_path / "cpu.txt", cpu_block(step, 1.0 + step))
+        append(tmp_path / "timings.txt", timings_block(step, 1.2))
+        append(tmp_path / "timings.txt", timings_block(step, 1.5))
+        append(tmp_path / "balance.txt", balance_line(step, 1000 * (step + 1)))
+    # A partial line is left for the next read
+    append(tmp_path / "cpu.txt", "Step 2, Time: 0.0")
+
+    # Step 1 may still be written to; only step 0 is complete
+    assert ingester.poll() == 1
+    append(tmp_path / "cpu.txt", "3, CPUs: 4, HighestActiveTimeBin: 20\n")
+    assert ingester.poll() == 1
+    assert ingester.poll(final=True) == 1
+
+    with database.session_scope() as db:
+        steps = db.query(SimulationStep).order_by(SimulationStep.step).all()
+        first = steps[0]
+        assert [s.step for s in steps] == [0, 1, 2]
+        assert first.total_seconds == 1.0
+        assert first.tree_seconds == 0.5
+        assert first.pm_seconds == 0.2
+        assert first.domain_seconds == 0.1
+        assert first.io_seconds == 0.05
+        assert first.imbalance == 1.5
+        assert first.active_particles == 1000
+        assert steps[2].time == pytest.approx(0.03)
+
+
+def test_steps_endpoint_downsamples(job, client):
+    with database.session_scope() as db:
+        db.add_all(
+            SimulationStep(
+                job_id=job,
+                step=step,
+                total_seconds=float(step),
+                imbalance=2.0 if step == 7 else 1.0,
+            )
+            for step in range(10)
+        )
+
+    data = client.get(f"/api/v1/jobs/{job}/steps?max_points=5").json()
+    assert data["total_steps"] == 10
+    assert data["steps_per_point"] == 2
+    assert [p["step"] for p in data["steps"]] == [0, 2, 4, 6, 8]
+    assert [p["total_seconds"] for p in data["steps"]] == [0.5, 2.5, 4.5, 6.5, 8.5]
+    assert [p["imbalance"] for p in data["steps"]] == [1.0, 1.0, 1.0, 2.0, 1.0]
+
+    full = client.get(f"/api/v1/jobs/{job}/steps").json()
+    assert full["steps_per_point"] == 1
+    assert len(full["steps"]) == 10
+
+
+def test_rows_survive_failed_store(job, tmp_path, monkeypatch):
+    ingester = StepStatsIngester(job, tmp_path)
+    for step in range(3):
+        append(tmp_path / "cpu.txt", cpu_block(step, 1.0))
+
+    @contextmanager
+    def database_down():
+        raise OperationalError("INSERT", {}, Exception("connection lost"))
+        yield
+
+    monkeypatch.setattr(gadget4_stats, "session_scope", database_down)
+    ingester.maybe_poll()  # Logs the error instead of failing the run
+    assert sorted(ingester.pending) == [0, 1, 2]  # Step 2 is still open
+    assert ingester.stored == 0
+
+    monkeypatch.setattr(gadget4_stats, "session_scope", database.session_scope)
+    assert ingester.poll(final=True) == 3
+    with database.session_scope() as db:
+        assert db.query(SimulationStep).count() == 3
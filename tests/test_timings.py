@@ -0,0 +1,124 @@
+"""Per-phase job timing tests."""
+
+import sys
+
+import pytest
+
+from common import database, storage
+from common.config import settings
+from common.models import JobStatus, SimulationJob
+from common.storage import LocalStorage
+from workers import runner, tasks
+from workers.runner import SimulationError
+
+FAKE_GADGET4 = """#!/bin/sh
+mkdir -p output
+echo "Sync-Point 1, Time: 1.0, Redshift: 0"
+echo snapshot > output/snapshot_000.hdf5
+sleep 0.2
+"""
+
+HUNGRY_GADGET4 = f"""#!/bin/sh
+mkdir -p output
+{sys.executable} -c "import time; x = bytearray(200 * 1024 * 1024); time.sleep(0.3)"
+"""
+
+FAILING_GADGET4 = """#!/bin/sh
+echo "out of memory"
+exit 1
+"""
+
+
+@pytest.fixture
+def worker_env(session_factory, tmp_path, monkeypatch, redis_stub):
+    """Point the worker at the test database, local storage and Redis stub."""
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    monkeypatch.setattr(storage, "_backend", LocalStorage(str(tmp_path / "out")))
+    monkeypatch.setattr(tasks, "redis_client", redis_stub)
+    monkeypatch.setattr(runner, "RSS_SAMPLE_INTERVAL", 0.02)
+    monkeypatch.setattr(tasks, "queue_postprocessing", lambda *args: None)
+
+    def use_simulator(script: str) -> None:
+        executable = tmp_path / "gadget4"
+        executable.write_text(script)
+        executable.chmod(0o755)
+        monkeypatch.setattr(settings, "gadget4_executable", str(executable))
+
+    return use_simulator
+
+
+def add_job(job_id: str, profile: bool = False) -> None:
+    with database.session_scope() as db:
+        db.add(
+            SimulationJob(
+                id=job_id,
+                name=job_id,
+                num_particles=1000,
+                box_size=10.0,
+                status=JobStatus.PENDING,
+                profile=profile,
+            )
+        )
+
+
+def test_completed_job_records_phases_and_profile(worker_env, client):
+    worker_env(FAKE_GADGET4)
+    add_job("timed-ok", profile=True)
+
+    tasks.execute_job("timed-ok")
+
+    response = client.get("/api/v1/jobs/timed-ok/timings")
+    assert response.status_code == 200
+    timings = response.json()
+    assert timings["status"] == "completed"
+    phases = {phase["name"]: phase for phase in timings["phases"]}
+    assert list(phases) == [
+        "queue_wait",
+        "parameter_generation",
+        "simulation",
+        "log_upload",
+        "result_upload",
+    ]
+    assert all(phase["ok"] for phase in phases.values())
+    assert phases["parameter_generation"]["bytes"] > 0
+    assert phases["result_upload"]["bytes"] == len("snapshot\n")
+    assert phases["simulation"]["peak_rss_mb"] > 0
+    assert timings["profile_path"].endswith("timed-ok/profile.pstats")
+
+
+def test_failed_job_records_failing_phase(worker_env, client):
+    worker_env(FAILING_GADGET4)
+    add_job("timed-fail")
+
+    with pytest.raises(SimulationError):
+        tasks.execute_job("timed-fail")
+
+    timings = client.get("/api/v1/jobs/timed-fail/timings").json()
+    phases = {phase["name"]: phase for phase in timings["phases"]}
+    assert phases["simulation"]["ok"] is False
+    assert phases["log_upload"]["ok"] is True
+    assert "result_upload" not in phases
+    assert timings["profile_path"] is None
+
+
+def test_timings_unknown_job(client):
+    assert client.get("/api/v1/jobs/missing/timings").status_code == 404
+
+
+def test_peak_rss_is_per_job(worker_env, client):
+    worker_env(HUNGRY_GADGET4)
+    add_job("timed-hungry")
+    tasks.execute_job("timed-hungry")
+    worker_env(FAKE_GADGET4)
+    add_job("timed-small")
+    tasks.execute_job("timed-small")
+
+    def phases(job_id):
+        timings = client.get(f"/api/v1/jobs/{job_id}/timings").json()
+        return {phase["name"]: phase for phase in timings["phases"]}
+
+    hungry, small = phases("timed-hungry"), phases("timed-small")
+    assert hungry["simulation"]["peak_rss_mb"] > 200
+    # Not the high-water mark left behind by the earlier job
+    assert 0 < small["simulation"]["peak_rss_mb"] < 50
+    assert small["result_upload"]["peak_rss_mb"] is None
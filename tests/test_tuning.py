@@ -0,0 +1,156 @@
+"""Gadget4 parameter auto-tuning tests."""
+
+from datetime import datetime
+
+import pytest
+
+from common import database
+from common.models import JobStatus, SimulationJob, SimulationStep, SimulatorType
+from common.tuning import InsufficientMemory, RunHistory, similar_runs, tune_gadget4
+from workers import tasks
+
+
+def test_defaults_without_history():
+    tuning = tune_gadget4(1_000_000, 8, memory_per_rank_mb=1843.2)
+    params = tuning["parameters"]
+    assert params["TopNodeFactor"] == 2.5
+    assert params["ActivePartFracForNewDomainDecomp"] == 0.01
+    assert params["NumFilesPerSnapshot"] == 1
+    assert 0 < params["MaxMemSize"] <= 1843.2 - 300
+    assert tuning["history_jobs"] == 0
+
+
+def test_large_runs_split_snapshots_and_cap_memory():
+    params = tune_gadget4(512**3, 16, memory_per_rank_mb=3686.4)["parameters"]
+    assert params["NumFilesPerSnapshot"] == 4
+    assert params["MaxMemSize"] == 3300  # Capped, rounded down to 100 MB
+
+
+def test_refuses_runs_that_do_not_fit():
+    # The PM grid alone of a 1-rank 100k-particle run needs 3 GB
+    with pytest.raises(InsufficientMemory):
+        tune_gadget4(100_000, 1, memory_per_rank_mb=1843.2)
+    tuning = tune_gadget4(
+        100_000, 1, memory_per_rank_mb=1843.2, overrides={"MaxMemSize": 1500}
+    )
+    assert "MaxMemSize" not in tuning["parameters"]
+
+
+def test_packed_single_rank_job_tuned_to_its_memory_share(
+    session_factory, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    job_ids = [f"packed-{i}" for i in range(4)]
+    with database.session_scope() as db:
+        for job_id in job_ids:
+            db.add(
+                SimulationJob(
+                    id=job_id,
+                    name=job_id,
+                    simulator_type=SimulatorType.GADGET4,
+                    num_particles=100_000,
+                    box_size=50.0,
+                    queue="gadget4",
+                    status=JobStatus.PENDING,
+                    celery_task_id="batch-1",
+                )
+            )
+    heaps = []
+
+    def execute_job(job_id, cpus=None, memory_mb=None):
+        work_dir = tmp_path / job_id
+        work_dir.mkdir()
+        job = tasks.load_job(job_id)
+        param_file = tasks.write_parameter_file(job, work_dir, len(cpus), memory_mb)
+        lines = dict(line.split() for line in param_file.read_text().splitlines())
+        heaps.append(int(lines["MaxMemSize"]))
+        return {"job_id": job_id, "status": "completed"}
+
+    monkeypatch.setattr(tasks, "execute_job", execute_job)
+
+    tasks.run_packed_simulations.apply(args=[job_ids], task_id="batch-1").get()
+
+    # Four 3.4 GB jobs share the 14.4 GB a 16 GB worker gives simulators
+    assert len(heaps) == 4
+    assert all(3100 <= heap <= 3400 for heap in heaps)
+
+
+def test_history_adjusts_domain_decomposition():
+    imbalanced = tune_gadget4(
+        1_000_000, 8, None, RunHistory(jobs=5, imbalance=1.6, domain_fraction=0.05)
+    )
+    assert imbalanced["parameters"]["TopNodeFactor"] == 4.0
+    assert imbalanced["parameters"]["ActivePartFracForNewDomainDecomp"] == 0.005
+    assert "imbalance 1.60" in imbalanced["reasons"]["TopNodeFactor"]
+
+    decomposing = tune_gadget4(
+        1_000_000, 8, None, RunHistory(jobs=5, imbalance=1.0, domain_fraction=0.3)
+    )
+    assert decomposing["parameters"]["TopNodeFactor"] == 2.0
+    assert decomposing["parameters"]["ActivePartFracForNewDomainDecomp"] == 0.02
+
+
+def test_job_parameters_override_tuning():
+    tuning = tune_gadget4(1_000_000, 8, None, overrides={"TopNodeFactor": 3.0})
+    assert "TopNodeFactor" not in tuning["parameters"]
+    assert tuning["overridden"] == ["TopNodeFactor"]
+
+
+def add_run(db, job_id, num_particles, imbalance, queue="gadget4"):
+    db.add(
+        SimulationJob(
+            id=job_id,
+            name=job_id,
+            simulator_type=SimulatorType.GADGET4,
+            num_particles=num_particles,
+            box_size=100.0,
+            status=JobStatus.COMPLETED,
+            queue=queue,
+            completed_at=datetime.utcnow(),
+        )
+    )
+    db.add_all(
+        SimulationStep(
+            job_id=job_id,
+            step=step,
+            total_seconds=1.0,
+            domain_seconds=0.1,
+            imbalance=imbalance,
+        )
+        for step in range(3)
+    )
+
+
+def test_tuned_parameters_written_and_recorded(session_factory, monkeypatch, tmp_path):
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    with database.session_scope() as db:
+        add_run(db, "similar-1", 900_000, 1.5)
+        add_run(db, "similar-2", 1_200_000, 1.3)
+        add_run(db, "too-small", 10_000, 3.0)
+        add_run(db, "other-queue", 1_000_000, 3.0, queue="gadget4-highmem")
+        db.add(
+            SimulationJob(
+                id="new",
+                name="new",
+                num_particles=1_000_000,
+                box_size=100.0,
+                queue="gadget4",
+                parameters={"MaxMemSize": 1234},
+            )
+        )
+
+    with database.session_scope() as db:
+        history = similar_runs(db, 1_000_000, "gadget4")
+    assert history.jobs == 2
+    assert history.imbalance == 1.4
+    assert abs(history.domain_fraction - 0.1) < 1e-9
+
+    param_file = tasks.write_parameter_file(tasks.load_job("new"), tmp_path, 8)
+
+    lines = dict(line.split() for line in param_file.read_text().splitlines())
+    assert lines["MaxMemSize"] == "1234"
+    assert lines["TopNodeFactor"] == "3.5"
+    recorded = tasks.load_job("new").tuned_parameters
+    assert recorded["parameters"]["TopNodeFactor"] == 3.5
+    assert recorded["overridden"] == ["MaxMemSize"]
+    assert recorded["history_jobs"] == 2
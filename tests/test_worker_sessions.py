@@ -0,0 +1,97 @@
+"""Worker database connection usage tests."""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from common import database, storage
+from common.config import settings
+from common.database import Base
+from common.models import JobStatus, SimulationJob
+from common.storage import LocalStorage
+from workers import tasks
+
+# Stand-in simulator that blocks until the test releases it
+FAKE_GADGET4 = """#!/bin/sh
+touch "$(dirname "$0")/started-$$"
+while [ ! -f "$(dirname "$0")/release" ]; do sleep 0.05; done
+echo "Sync-Point 1, Time: 1.0, Redshift: 0"
+"""
+
+
+@pytest.fixture
+def counted_engine(tmp_path, monkeypatch):
+    """File-backed database with a regular pool that counts checkouts."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'jobs.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    engine.checked_out = 0
+
+    @event.listens_for(engine, "checkout")
+    def checkout(*args):
+        engine.checked_out += 1
+
+    @event.listens_for(engine, "checkin")
+    def checkin(*args):
+        engine.checked_out -= 1
+
+    monkeypatch.setattr(
+        database, "SessionLocal", sessionmaker(autoflush=False, bind=engine)
+    )
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("in_flight", [1, 8])
+def test_no_connection_held_while_simulations_run(
+    counted_engine, tmp_path, monkeypatch, redis_stub, in_flight
+):
+    sim_dir = tmp_path / "sim"
+    sim_dir.mkdir()
+    executable = sim_dir / "gadget4"
+    executable.write_text(FAKE_GADGET4)
+    executable.chmod(0o755)
+    monkeypatch.setattr(settings, "gadget4_executable", str(executable))
+    monkeypatch.setattr(storage, "_backend", LocalStorage(str(tmp_path / "out")))
+    monkeypatch.setattr(tasks, "redis_client", redis_stub)
+
+    job_ids = [f"sessions-{in_flight}-{i}" for i in range(in_flight)]
+    with database.session_scope() as db:
+        for job_id in job_ids:
+            db.add(
+                SimulationJob(
+                    id=job_id,
+                    name=job_id,
+                    num_particles=1000,
+                    box_size=10.0,
+                    status=JobStatus.PENDING,
+                )
+            )
+
+    threads = [
+        threading.Thread(target=tasks.execute_job, args=(job_id,)) for job_id in job_ids
+    ]
+    for thread in threads:
+        thread.start()
+
+    deadline = time.monotonic() + 10
+    while len(list(sim_dir.glob("started-*"))) < in_flight:
+        assert time.monotonic() < deadline, "simulations did not start"
+        time.sleep(0.05)
+
+    # Every simulation is running; none of them holds a connection
+    assert counted_engine.checked_out == 0
+
+    (sim_dir / "release").touch()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    with database.session_scope() as db:
+        statuses = {job.status for job in db.query(SimulationJob)}
+    assert statuses == {JobStatus.COMPLETED}
+    assert counted_engine.checked_out == 0